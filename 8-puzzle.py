@@ -17,14 +17,21 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-import math
 import random
 import ctypes
 import sys
+try:
+	import numpy
+except ImportError:
+	numpy = None
 from csearch import AStarSearch
-from csearch import Successors
+from slidingpuzzle import SlidingPuzzle, line_conflicts
 
-class Board:
+# A game board is packed into one integer with 4 bits per
+# tile, the tile at index i in bits 4*i to 4*i+3. Boards hash
+# and compare as that integer. csearch keeps the boards a
+# search refers to alive until the search is cleaned up.
+class Board( object ):
 	WIDTH  = 3
 	HEIGHT = 3
 	GOAL_STATE = [
@@ -32,101 +39,87 @@ class Board:
 		4, 5, 6,
 		7, 8, 0
 	]
-	state = []
-	# A collection of all of the game board
-	# states that are possibilities.
-	# This is used to ensure that the GC
-	# doesn't take our references away from us.
-	states = []
+	__slots__ = ('packed',)
 
 	def __init__( self, board = None ):
-		if board == None:
-			self.state = list(self.GOAL_STATE)
-		else:
-			self.state = list(board)
+		if board is None:
+			board = self.GOAL_STATE
 
-		Board.states.append( self ) # this is needed to avoid self getting garbage collected
+		if isinstance( board, Board ):
+			self.packed = board.packed
+		else:
+			packed = 0
+			for index in xrange(0, self.WIDTH * self.HEIGHT):
+				packed |= board[ index ] << (4 * index)
+			self.packed = packed
 
 	@staticmethod
 	def goal():
 		goal_state = Board( Board.GOAL_STATE )
 		return goal_state
 
-	# Generate a random game board.
+	# Generate a random game board. With only_solvable the goal is
+	# scrambled by random moves of the blank, whose position is
+	# tracked as it moves. Otherwise the tiles are shuffled, and half
+	# of the boards this produces have no solution.
 	def randomize( self, only_solvable ):
 		if not(only_solvable):
-			# This may or may not produce a board with a solution.
-			length = self.WIDTH * self.HEIGHT
-
-			numbers = [ i for x in xrange(0, length) ]
-
-			for i in xrange(length - 1, 0, -1):
-				random_index = random.randint( 0, i + 1)
-				chosen = numbers[ random_index ]
-				numbers[ random_index ] = numbers[ i ]
-				self.state[ i ] = chosen
+			numbers = list(xrange(0, self.WIDTH * self.HEIGHT))
+			random.shuffle( numbers )
+			for index in xrange(0, len(numbers)):
+				self[ index ] = numbers[ index ]
 		else:
 			# Start with the goal
 			current_board = Board.goal()
+			blank = Board.GOAL_STATE.index( 0 )
 
-			potential_moves = [
-				( -1,  0 ),
-				(  1,  0 ),
-				(  0, -1 ),
-				(  0,  1 )
-			]
-
-			# Attempt to make 14 moves to scramble the goal state.
-			# This new state will be the start state.
-			moves = 14
-			while moves > 0:
-				moves -= 1
-
-				for y in xrange(0, self.HEIGHT):
-					for x in xrange(0, self.WIDTH):
-						index = self.WIDTH * y + x
+			# Make 14 moves to scramble the goal state. This new
+			# state will be the start state.
+			for move in xrange(0, 14):
+				move_index = random.choice( PUZZLE.moves[ blank ] )
+				current_board.swap( blank, move_index )
+				blank = move_index
 
-						# loop until you find the empty space to make moves
-						if current_board[ index ] == 0:
-							moved = False
+			# copy randomized board to the game board
+			self.packed = current_board.packed
 
-							while not(moved):
-								m = random.randint(0, 3)
-								move_x = x + potential_moves[ m ][ 0 ]
-								move_y = y + potential_moves[ m ][ 1 ]
+	def __getitem__( self, key ):
+		return (self.packed >> (4 * key)) & 0xF
 
-								if 0 <= move_x < Board.WIDTH and 0 <= move_y < Board.HEIGHT:
-									# make the move
-									move_index = self.WIDTH * move_y + move_x
+	def __setitem__( self, key, value ):
+		shift = 4 * key
+		self.packed = (self.packed & ~(0xF << shift)) | (value << shift)
 
-									tmp = current_board[ index ]
-									current_board[ index ] = current_board[ move_index ]
-									current_board[ move_index ] = tmp
+	def __eq__( self, other ):
+		return self.packed == other.packed
 
-									moved = True
+	def __ne__( self, other ):
+		return self.packed != other.packed
 
-			# copy randomized board to the game board
-			length = self.WIDTH * self.HEIGHT
-			for i in xrange(0, length):
-				self.state[ i ] = current_board[ i ]
+	def __hash__( self ):
+		return hash(self.packed)
 
-	def __getitem__( self, key ):
-		return self.state[ key ]
+	def hash( self ):
+		return self.packed
 
-	def __setitem__( self, key, value ):
-		self.state[ key ] = value
+	# The tiles of the board as a list.
+	def tiles( self ):
+		packed = self.packed
+		return [ (packed >> (4 * index)) & 0xF for index in xrange(0, self.WIDTH * self.HEIGHT) ]
 
-	def hash( self ):
-		return hash(tuple(self.state))
+	# Exchange two tiles in place.
+	def swap( self, index, move_index ):
+		shift      = 4 * index
+		move_shift = 4 * move_index
+		packed     = self.packed
+		diff       = ((packed >> shift) ^ (packed >> move_shift)) & 0xF
+		self.packed = packed ^ ((diff << shift) | (diff << move_shift))
 
 
 	# Draw a game board state. Step 0 implies no moves have
 	# occurred and is our initial board.
 	def draw( self, step ):
-		tile = lambda x, y: " " if self.state[Board.WIDTH * y + x] == 0 else self.state[Board.WIDTH * y + x]
-
-		if self.state == None or len(self.state) == 0:
-			print "self.state is BAD. {}".format( self.state )
+		tile = lambda x, y: " " if self[Board.WIDTH * y + x] == 0 else self[Board.WIDTH * y + x]
 
 		for y in xrange(0, Board.HEIGHT):
 			if y == 1:
@@ -139,9 +132,9 @@ class Board:
 		print ""
 
 	def debug( self ):
-		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self.state[ 0 ],  self.state[ 1 ],  self.state[ 2 ] );
-		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self.state[ 3 ],  self.state[ 4 ],  self.state[ 5 ] );
-		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self.state[ 6 ],  self.state[ 7 ],  self.state[ 8 ] );
+		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self[ 0 ],  self[ 1 ],  self[ 2 ] );
+		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self[ 3 ],  self[ 4 ],  self[ 5 ] );
+		print ' |{0:1d}|{1:1d}|{2:1d}|'.format( self[ 6 ],  self[ 7 ],  self[ 8 ] );
 		print ""
 
 	# Create a new game board by transposing two titles
@@ -149,13 +142,14 @@ class Board:
 		assert( index != move_index )
 		assert( 0 <= index < Board.WIDTH * Board.HEIGHT )
 		assert( 0 <= move_index < Board.WIDTH * Board.HEIGHT )
-		new_board = Board( self.state )
-		tmp = new_board[ index ]
-		new_board[ index ] = new_board[ move_index ]
-		new_board[ move_index ] = tmp
+		new_board = Board( self )
+		new_board.swap( index, move_index )
 		assert( isinstance(new_board, Board) )
 		return new_board
 
+# The moves and the solvability check of the general sliding puzzle.
+PUZZLE = SlidingPuzzle( Board.WIDTH, Board.HEIGHT, Board.GOAL_STATE )
+
 def find_empty_space( board ):
 	for x in xrange(0, Board.WIDTH):
 		for y in xrange(0, Board.HEIGHT):
@@ -170,9 +164,10 @@ def find_empty_space( board ):
 
 # Given a game board, what are all of the possible
 # game boards that can result from all of the potential
-# moves.
+# moves. They are returned together so that the search
+# can take them in one batch.
 def get_possible_moves( current_board, successors_handle ):
-	successors = Successors(successors_handle)
+	successors = []
 	potential_moves = [
 		( -1,  0 ),
 		(  1,  0 ),
@@ -193,23 +188,86 @@ def get_possible_moves( current_board, successors_handle ):
 			# make the move
 			new_board = current_board.transpose( index, move_index )
 			assert( isinstance(new_board, Board) )
-			successors.push( new_board )
-
-# The sum of the manhattan distance of each number between
-# game boards.
+			successors.append( new_board )
+
+	return successors
+
+# The manhattan distance between every pair of board positions.
+DISTANCE = [ [ abs(i % Board.WIDTH - j % Board.WIDTH) + abs(i // Board.WIDTH - j // Board.WIDTH)
+               for j in xrange(0, Board.WIDTH * Board.HEIGHT) ]
+             for i in xrange(0, Board.WIDTH * Board.HEIGHT) ]
+
+ROWS    = [ [ Board.WIDTH * y + x for x in xrange(0, Board.WIDTH) ] for y in xrange(0, Board.HEIGHT) ]
+COLUMNS = [ [ Board.WIDTH * y + x for y in xrange(0, Board.HEIGHT) ] for x in xrange(0, Board.WIDTH) ]
+
+# The position of every tile on a goal board. The search passes
+# the same goal board on every heuristic call, so the table for
+# the last goal is kept.
+last_goal = None
+last_goal_positions = None
+
+def goal_positions( goal ):
+	global last_goal, last_goal_positions
+	if goal is not last_goal:
+		positions = [ 0 ] * (Board.WIDTH * Board.HEIGHT)
+		for index in xrange(0, Board.WIDTH * Board.HEIGHT):
+			positions[ goal[ index ] ] = index
+		last_goal = goal
+		last_goal_positions = positions
+	return last_goal_positions
+
+# The sum of the manhattan distance of each tile between
+# game boards. The blank is not counted.
 def heuristic( board1, board2 ):
+	positions = goal_positions( board2 )
+	packed = board1.packed
 	sum = 0
-	for y1 in xrange(0, Board.HEIGHT):
-		for x1 in xrange(0, Board.WIDTH):
-			index1 = Board.WIDTH * y1 + x1
-			for y2 in xrange(0, Board.HEIGHT):
-				for x2 in xrange(0, Board.WIDTH):
-					index2 = Board.WIDTH * y2 + x2
-
-					if board1[ index1 ] == board2[ index2 ]:
-						sum += int( math.fabs( x2 - x1 ) + math.fabs( y2 - y1 ))
+	for index in xrange(0, Board.WIDTH * Board.HEIGHT):
+		tile = packed & 0xF
+		packed >>= 4
+		if tile != 0:
+			sum += DISTANCE[ index ][ positions[ tile ] ]
+	return sum
+
+# Manhattan distance plus linear conflicts: two tiles on their goal
+# row (or column) in the reverse order need at least two more moves
+# than their manhattan distances. This is still admissible and
+# expands fewer nodes than the manhattan distance alone.
+def linear_conflict( board1, board2 ):
+	positions = goal_positions( board2 )
+	sum = heuristic( board1, board2 )
+	tiles = board1.tiles( )
+
+	for y in xrange(0, Board.HEIGHT):
+		goals = []
+		for index in ROWS[ y ]:
+			tile = tiles[ index ]
+			if tile != 0 and positions[ tile ] // Board.WIDTH == y:
+				goals.append( positions[ tile ] )
+		sum += line_conflicts( goals )
+
+	for x in xrange(0, Board.WIDTH):
+		goals = []
+		for index in COLUMNS[ x ]:
+			tile = tiles[ index ]
+			if tile != 0 and positions[ tile ] % Board.WIDTH == x:
+				goals.append( positions[ tile ] )
+		sum += line_conflicts( goals )
+
 	return sum
 
+# The manhattan distance from each of many boards to one goal,
+# computed in one NumPy operation. This is optional and needs
+# NumPy; it suits scoring a whole set of successors at once.
+def heuristic_many( boards, goal ):
+	if numpy == None:
+		raise ImportError( "heuristic_many needs numpy" )
+	tiles     = numpy.array( [ [ board[ i ] for i in xrange(0, Board.WIDTH * Board.HEIGHT) ] for board in boards ] )
+	positions = numpy.array( goal_positions( goal ) )
+	distances = numpy.array( DISTANCE )[ numpy.arange( Board.WIDTH * Board.HEIGHT ), positions[ tiles ] ]
+	distances[ tiles == 0 ] = 0
+	return distances.sum( axis = 1 )
+
 # The cost of making a move is 1.
 def cost( board1, board2 ):
 	return 1
@@ -217,10 +275,7 @@ def cost( board1, board2 ):
 # Two game boards are equal if every number is in the same
 # position in both.
 def board_compare( board1, board2 ):
-	for i in xrange(0, Board.WIDTH * Board.HEIGHT):
-		if board1[ i ] != board2[ i ]:
-			return 1
-	return 0
+	return 0 if board1.packed == board2.packed else 1
 
 def state_hash(board):
 	return board.hash()
@@ -228,13 +283,18 @@ def state_hash(board):
 def main():
 	random.seed( None )
 
-	astar = AStarSearch( board_compare, state_hash, heuristic, cost, get_possible_moves )
+	astar = AStarSearch( board_compare, state_hash, linear_conflict, cost, get_possible_moves )
 
 	# Produce a solvable random board
 	initial_state = Board()
 	initial_state.randomize( True )
 
-	if astar.find( Board.goal(), initial_state ):
+	# A board of the other parity would make the search visit every
+	# board it can reach before giving up.
+	if not PUZZLE.solvable( initial_state.tiles() ):
+		print "No solution exists for:\n\n"
+		initial_state.draw( 0 );
+	elif astar.find( Board.goal(), initial_state ):
 		step = 0
 
 		for board in astar:
@@ -0,0 +1,74 @@
+# Copyright (C) 2010 by Joseph A. Marrero
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#  Asyncio Search Driver
+#
+#  Runs the searches of csearch on an asyncio event loop. A search is
+#  stepped through the iterative methods in slices of at most `nodes`
+#  expansions, and of at most `seconds` when given, and hands control
+#  back to the loop between slices. Searches running at the same time
+#  take turns one slice each, so many small searches can share one
+#  thread. A search with external memory takes a whole chunk per
+#  expansion, so its slices are as coarse as ExternalMemory.chunk
+#  allows. This module needs Python 3.5 or later; csearch itself does
+#  not import it.
+#
+#  A search object runs one search at a time, so concurrent searches
+#  each need their own. Cancelling the task stops its search at the
+#  end of the current slice. With a timeout, asyncio.TimeoutError is
+#  raised once the search has run that many seconds. In both cases the
+#  search is left as it stopped, so partialPath() can still be read,
+#  and cleanup() is up to the caller.
+#
+#      found = await asyncsearch.find( search, start, goal, timeout = 0.05 )
+#
+import asyncio
+import timeit
+from ctypes import c_bool
+
+async def find( search, start, end, nodes = 256, seconds = None, timeout = None ):
+	timer    = timeit.default_timer
+	deadline = timer() + timeout if timeout is not None else None
+	found    = c_bool( False )
+	search.iterativeInit( start, end, found )
+
+	while True:
+		slice_deadline = deadline
+		if seconds is not None:
+			slice_deadline = timer() + seconds
+			if deadline is not None:
+				slice_deadline = min( slice_deadline, deadline )
+
+		if search.iterativeRun( start, end, found, nodes, slice_deadline ):
+			return found.value
+		if deadline is not None and timer() >= deadline:
+			raise asyncio.TimeoutError( "the search ran out of time" )
+		await asyncio.sleep( 0 )
+
+# Run find for every (search, start, end) query at once and return
+# whether each was solved, in order. Queries that time out report
+# None instead of raising.
+async def find_all( queries, nodes = 256, seconds = None, timeout = None ):
+	async def run( search, start, end ):
+		try:
+			return await find( search, start, end, nodes, seconds, timeout )
+		except asyncio.TimeoutError:
+			return None
+	return await asyncio.gather( *[ run( search, start, end ) for search, start, end in queries ] )
@@ -0,0 +1,431 @@
+# Copyright (C) 2010 by Joseph A. Marrero
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Times the native and the Python search backends on the same
+# seeded 8-puzzle instances. Usage:
+#
+#     python benchmark.py [instances] [scramble moves] [seed]
+#     python benchmark.py binding [calls]
+#     python benchmark.py suite [output] [seed] [instances]
+#     python benchmark.py compare <old output> <new output> [slowdown]
+#
+# Each backend is timed with a successors function that pushes states
+# one at a time and with one that returns them as a list.
+#
+# The binding mode counts successors_push and astar_next_node calls
+# per second, with the ctypes prototype set up on every call as the
+# binding used to do, and with the prototypes bound once.
+#
+# The suite mode runs every engine and heuristic on seeded 8-puzzle
+# and 15-puzzle instances of known solution depths and on weighted
+# grids, and writes one JSON object per run. The compare mode reads
+# two such outputs and exits with status 1 when the newer one expands
+# more nodes, loses an optimal solution or is slower in total by more
+# than the slowdown factor.
+#
+import json
+import random
+import sys
+import timeit
+import csearch
+import patterndb
+from ctypes import c_bool, c_void_p, py_object
+from csearch import AStarSearch, BestFirstSearch, DijkstraSearch, IDAStarSearch
+from csearch import Successors
+from slidingpuzzle import SlidingPuzzle
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+WIDTH  = 3
+HEIGHT = 3
+GOAL   = (1, 2, 3, 4, 5, 6, 7, 8, 0)
+
+def neighbors( index ):
+	x = index % WIDTH
+	y = index // WIDTH
+	result = []
+	if x > 0:          result.append( index - 1 )
+	if x < WIDTH - 1:  result.append( index + 1 )
+	if y > 0:          result.append( index - WIDTH )
+	if y < HEIGHT - 1: result.append( index + WIDTH )
+	return result
+
+MOVES = [ neighbors( i ) for i in range(WIDTH * HEIGHT) ]
+
+def swap( board, i, j ):
+	tiles = list(board)
+	tiles[ i ], tiles[ j ] = tiles[ j ], tiles[ i ]
+	return tuple(tiles)
+
+def successors_of( board, handle ):
+	blank = board.index( 0 )
+	return [ swap( board, blank, move ) for move in MOVES[ blank ] ]
+
+# The same moves pushed one state at a time through Successors.
+def push_successors_of( board, handle ):
+	successors = Successors( handle )
+	blank = board.index( 0 )
+	for move in MOVES[ blank ]:
+		successors.push( swap( board, blank, move ) )
+
+def manhattan( board1, board2 ):
+	sum = 0
+	for index1 in range(WIDTH * HEIGHT):
+		tile = board1[ index1 ]
+		if tile != 0:
+			index2 = board2.index( tile )
+			sum += abs( index1 % WIDTH - index2 % WIDTH ) + abs( index1 // WIDTH - index2 // WIDTH )
+	return sum
+
+def cost( board1, board2 ):
+	return 1
+
+def compare( board1, board2 ):
+	return 0 if board1 == board2 else 1
+
+def state_hash( board ):
+	return hash(board)
+
+def scramble( rng, moves ):
+	board = GOAL
+	for i in range(moves):
+		blank = board.index( 0 )
+		board = swap( board, blank, rng.choice( MOVES[ blank ] ) )
+	return board
+
+def run( backend, successors, instances ):
+	astar = AStarSearch( compare, state_hash, manhattan, cost, successors, backend = backend )
+	lengths = []
+	start_time = timeit.default_timer()
+	for board in instances:
+		if not astar.find( board, GOAL ):
+			lengths.append( -1 )
+			continue
+		lengths.append( astar.pathLength( ) - 1 )
+		astar.cleanup( )
+	return timeit.default_timer() - start_time, lengths
+
+def calls_per_second( fxn, count ):
+	start_time = timeit.default_timer()
+	for i in range(count):
+		fxn( )
+	return count / (timeit.default_timer() - start_time)
+
+def binding( count ):
+	lib   = csearch.native_library( )
+	table = csearch._load_native( ).tables[ 'astar' ]
+	rates = []
+
+	def push_per_call_prototype( board, handle ):
+		lib.successors_push.restype  = c_bool
+		lib.successors_push.argtypes = [c_void_p, py_object]
+		lib.successors_push( handle, py_object(board) )
+
+	def measure_push( board, handle ):
+		if not rates:
+			rates.append( calls_per_second( lambda: push_per_call_prototype( board, handle ), count ) )
+			Successors( handle ).clear( )
+			rates.append( calls_per_second( lambda: Successors( handle ).push( board ), count ) )
+			Successors( handle ).clear( )
+		push_successors_of( board, handle )
+
+	astar = AStarSearch( compare, state_hash, manhattan, cost, measure_push, backend = csearch.BACKEND_NATIVE )
+	astar.find( scramble( random.Random( 1 ), 10 ), GOAL )
+	node = table.first_node( astar.handle )
+
+	def next_per_call_prototype():
+		lib.astar_next_node.restype  = c_void_p
+		lib.astar_next_node.argtypes = [c_void_p]
+		lib.astar_next_node( node )
+
+	rates.append( calls_per_second( next_per_call_prototype, count ) )
+	rates.append( calls_per_second( lambda: table.next_node( node ), count ) )
+	astar.cleanup( )
+
+	print( "{0:>16} {1:>14} {2:>14}".format( "", "per-call setup", "bound once" ) )
+	print( "{0:>16} {1:>12.0f}/s {2:>12.0f}/s".format( "successors_push", rates[ 0 ], rates[ 1 ] ) )
+	print( "{0:>16} {1:>12.0f}/s {2:>12.0f}/s".format( "astar_next_node", rates[ 2 ], rates[ 3 ] ) )
+
+#  Benchmark Suite
+
+# Boards whose shortest solution is exactly depth moves. Walks are
+# kept only when A* confirms that they cannot be solved in fewer.
+def fixed_depth_instances( puzzle, depth, count, rng ):
+	astar = AStarSearch( compare, state_hash, puzzle.linear_conflict, puzzle.cost, puzzle.successors_of, backend = csearch.BACKEND_PYTHON )
+	instances = []
+	while len(instances) < count:
+		board = puzzle.walk( rng, depth )
+		if board is None or board in instances:
+			continue
+		astar.find( board, puzzle.goal )
+		if astar.pathLength( ) - 1 == depth:
+			instances.append( board )
+		astar.cleanup( )
+	return instances
+
+# A width x height grid of cells weighted 1 to 9, with a share of
+# walls, searched from one corner to the other.
+class Grid( object ):
+	def __init__( self, width, height, rng, walls = 0.2 ):
+		self.name    = "grid"
+		self.width   = width
+		self.height  = height
+		self.weights = {}
+		for y in range(height):
+			for x in range(width):
+				if rng.random( ) >= walls:
+					self.weights[ (x, y) ] = rng.randint( 1, 9 )
+		self.start = (0, 0)
+		self.goal  = (width - 1, height - 1)
+		self.weights[ self.start ] = rng.randint( 1, 9 )
+		self.weights[ self.goal ]  = rng.randint( 1, 9 )
+
+	def successors_of( self, cell, handle ):
+		x, y = cell
+		weights = self.weights
+		return [ c for c in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)) if c in weights ]
+
+	def cost( self, cell1, cell2 ):
+		return self.weights[ cell2 ]
+
+	# Every step costs at least 1, so this is admissible.
+	def manhattan( self, cell1, cell2 ):
+		return abs( cell1[ 0 ] - cell2[ 0 ] ) + abs( cell1[ 1 ] - cell2[ 1 ] )
+
+# Grids whose corners are connected, with their shortest path cost.
+def grid_instances( width, height, count, rng ):
+	instances = []
+	while len(instances) < count:
+		grid = Grid( width, height, rng )
+		dijkstra = DijkstraSearch( compare, state_hash, grid.cost, grid.successors_of, backend = csearch.BACKEND_PYTHON )
+		if dijkstra.find( grid.start, grid.goal ):
+			instances.append( (grid, dijkstra.pathCost( )) )
+	return instances
+
+# The searches of the suite, by engine name. Bidirectional searches
+# and IDA* run on the Python engine only.
+def make_search( engine, domain, heuristic, backend ):
+	if engine == 'astar':
+		return AStarSearch( compare, state_hash, heuristic, domain.cost, domain.successors_of, backend = backend )
+	elif engine == 'astar-bidirectional':
+		return AStarSearch( compare, state_hash, heuristic, domain.cost, domain.successors_of, bidirectional = True )
+	elif engine == 'idastar':
+		return IDAStarSearch( compare, state_hash, heuristic, domain.cost, domain.successors_of )
+	elif engine == 'dijkstra':
+		return DijkstraSearch( compare, state_hash, domain.cost, domain.successors_of, backend = backend )
+	elif engine == 'dijkstra-bidirectional':
+		return DijkstraSearch( compare, state_hash, domain.cost, domain.successors_of, bidirectional = True )
+	elif engine == 'bestfs':
+		return BestFirstSearch( compare, state_hash, heuristic, domain.successors_of, backend = backend )
+	raise ValueError( "unknown engine: {}".format( engine ) )
+
+def path_cost( domain, path ):
+	return sum( domain.cost( path[ i + 1 ], path[ i ] ) for i in range(len(path) - 1) )
+
+# Solve one instance twice: once for the time alone, and once with
+# search stats and tracemalloc on for the node counts and the peak
+# memory of Python allocations, which leaves out libcsearch's own.
+def measure( search, start, goal, domain ):
+	start_time = timeit.default_timer()
+	found      = search.find( start, goal )
+	seconds    = timeit.default_timer() - start_time
+	cost       = path_cost( domain, search.path( ) ) if found else None
+	search.cleanup( )
+
+	stats = search.enableStats( )
+	peak_memory = None
+	if tracemalloc != None:
+		tracemalloc.start( )
+	search.find( start, goal )
+	if tracemalloc != None:
+		peak_memory = tracemalloc.get_traced_memory( )[ 1 ]
+		tracemalloc.stop( )
+	search.cleanup( )
+	search.disableStats( )
+
+	return {
+		'found':            found,
+		'cost':             cost,
+		'seconds':          seconds,
+		'expanded':         stats.expanded,
+		'generated':        stats.generated,
+		'peak_open':        stats.peak_open,
+		'peak_closed':      stats.peak_closed,
+		'nodes_per_second': stats.expanded / seconds if seconds > 0 else None,
+		'peak_memory':      peak_memory,
+	}
+
+# (engine, heuristic, every backend?) for each domain.
+PUZZLE_RUNS = [
+	('astar', 'manhattan', True),
+	('astar', 'linear-conflict', True),
+	('astar', 'pattern-database', True),
+	('astar-bidirectional', 'linear-conflict', False),
+	('idastar', 'linear-conflict', False),
+	('idastar', 'pattern-database', False),
+	('bestfs', 'manhattan', True),
+]
+EIGHT_PUZZLE_RUNS = PUZZLE_RUNS + [
+	('dijkstra', None, True),
+	('dijkstra-bidirectional', None, False),
+]
+GRID_RUNS = [
+	('dijkstra', None, True),
+	('dijkstra-bidirectional', None, False),
+	('astar', 'manhattan', True),
+	('bestfs', 'manhattan', True),
+]
+
+# Pattern database groups: two groups of four tiles for the 8-puzzle
+# and five groups of three tiles for the 15-puzzle, which build in
+# seconds.
+def puzzle_heuristics( puzzle ):
+	n = puzzle.width * puzzle.height
+	size = 4 if n <= 9 else 3
+	groups = [ list(range(first, min(first + size, n))) for first in range(1, n, size) ]
+	return {
+		'manhattan':        puzzle.manhattan,
+		'linear-conflict':  puzzle.linear_conflict,
+		'pattern-database': patterndb.build( puzzle.width, puzzle.height, groups ).heuristic,
+	}
+
+def grid_heuristics( grid ):
+	return { 'manhattan': grid.manhattan }
+
+def suite_runs( domain, runs, heuristics, backends ):
+	for engine, heuristic, every_backend in runs:
+		for backend in (backends if every_backend else [ csearch.BACKEND_PYTHON ]):
+			yield engine, heuristic, backend, make_search( engine, domain, heuristics.get( heuristic ), backend )
+
+def suite( output, seed, count ):
+	rng = random.Random( seed )
+	backends = [ csearch.BACKEND_PYTHON ]
+	if csearch.default_backend( ) == csearch.BACKEND_NATIVE:
+		backends.insert( 0, csearch.BACKEND_NATIVE )
+
+	cases = []
+	for puzzle, depths, runs in ((SlidingPuzzle( 3, 3 ), (8, 16, 24), EIGHT_PUZZLE_RUNS), (SlidingPuzzle( 4, 4 ), (10, 20, 30), PUZZLE_RUNS)):
+		for depth in depths:
+			for index, board in enumerate(fixed_depth_instances( puzzle, depth, count, rng )):
+				cases.append( (puzzle, runs, puzzle_heuristics, "{}-{}".format( depth, index ), board, puzzle.goal, depth) )
+	for index, (grid, optimum) in enumerate(grid_instances( 40, 40, count, rng )):
+		cases.append( (grid, GRID_RUNS, grid_heuristics, str(index), grid.start, grid.goal, optimum) )
+
+	heuristics = {}
+	for domain, runs, make_heuristics, instance, start, goal, optimum in cases:
+		if domain not in heuristics:
+			heuristics[ domain ] = make_heuristics( domain )
+		for engine, heuristic, backend, search in suite_runs( domain, runs, heuristics[ domain ], backends ):
+			result = measure( search, start, goal, domain )
+			result.update( {
+				'domain':    domain.name,
+				'instance':  instance,
+				'engine':    engine,
+				'heuristic': heuristic,
+				'backend':   backend,
+				'optimum':   optimum,
+				'optimal':   result[ 'cost' ] == optimum,
+			} )
+			output.write( json.dumps( result, sort_keys = True ) + "\n" )
+			output.flush( )
+
+def run_key( result ):
+	return (result[ 'domain' ], result[ 'instance' ], result[ 'engine' ], result[ 'heuristic' ], result[ 'backend' ])
+
+def load_results( filename ):
+	with open( filename ) as f:
+		return dict( (run_key( result ), result) for result in (json.loads( line ) for line in f if line.strip( )) )
+
+# Compare two suite outputs over the runs they share. Returns the
+# regressions found, one line each.
+def compare_results( old, new, slowdown ):
+	regressions = []
+	old_seconds = 0.0
+	new_seconds = 0.0
+	for key in sorted( set( old ) & set( new ), key = str ):
+		before = old[ key ]
+		after  = new[ key ]
+		name   = " ".join( str(part) for part in key )
+		if before[ 'optimal' ] and not after[ 'optimal' ]:
+			regressions.append( "{}: no longer optimal ({} instead of {})".format( name, after[ 'cost' ], after[ 'optimum' ] ) )
+		if after[ 'expanded' ] > before[ 'expanded' ]:
+			regressions.append( "{}: expanded {} nodes instead of {}".format( name, after[ 'expanded' ], before[ 'expanded' ] ) )
+		old_seconds += before[ 'seconds' ]
+		new_seconds += after[ 'seconds' ]
+
+	if new_seconds > old_seconds * slowdown:
+		regressions.append( "total time {:.3f}s instead of {:.3f}s".format( new_seconds, old_seconds ) )
+	return regressions
+
+def main():
+	if len(sys.argv) > 1 and sys.argv[ 1 ] == 'suite':
+		seed  = int(sys.argv[ 3 ]) if len(sys.argv) > 3 else 1
+		count = int(sys.argv[ 4 ]) if len(sys.argv) > 4 else 2
+		if len(sys.argv) > 2 and sys.argv[ 2 ] != '-':
+			with open( sys.argv[ 2 ], 'w' ) as output:
+				suite( output, seed, count )
+		else:
+			suite( sys.stdout, seed, count )
+		return
+
+	if len(sys.argv) > 1 and sys.argv[ 1 ] == 'compare':
+		if len(sys.argv) < 4:
+			print( "usage: python benchmark.py compare <old output> <new output> [slowdown]" )
+			sys.exit( 2 )
+		slowdown    = float(sys.argv[ 4 ]) if len(sys.argv) > 4 else 1.25
+		regressions = compare_results( load_results( sys.argv[ 2 ] ), load_results( sys.argv[ 3 ] ), slowdown )
+		for regression in regressions:
+			print( regression )
+		sys.exit( 1 if regressions else 0 )
+
+	if len(sys.argv) > 1 and sys.argv[ 1 ] == 'binding':
+		if csearch.native_library( ) is None:
+			print( "libcsearch not found; the binding benchmark needs it." )
+			return
+		binding( int(sys.argv[ 2 ]) if len(sys.argv) > 2 else 100000 )
+		return
+
+	count = int(sys.argv[ 1 ]) if len(sys.argv) > 1 else 20
+	moves = int(sys.argv[ 2 ]) if len(sys.argv) > 2 else 30
+	seed  = int(sys.argv[ 3 ]) if len(sys.argv) > 3 else 1
+	rng   = random.Random( seed )
+	instances = [ scramble( rng, moves ) for i in range(count) ]
+
+	backends = [ csearch.BACKEND_PYTHON ]
+	if csearch.default_backend( ) == csearch.BACKEND_NATIVE:
+		backends.insert( 0, csearch.BACKEND_NATIVE )
+	else:
+		print( "libcsearch not found; only the Python backend is timed." )
+
+	results = []
+	for backend in backends:
+		for style, successors in (('push', push_successors_of), ('return', successors_of)):
+			elapsed, lengths = run( backend, successors, instances )
+			results.append( lengths )
+			print( "{0:>8} {1:<6}: {2:8.3f}s for {3} instances ({4:.2f} ms/instance)".format( backend, style, elapsed, count, 1000.0 * elapsed / count ) )
+
+	if any( lengths != results[ 0 ] for lengths in results ):
+		print( "warning: the runs disagree on solution lengths" )
+
+if __name__ == '__main__':
+	main()
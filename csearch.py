@@ -20,9 +20,19 @@
 from ctypes import *
 from ctypes.util import *
 
-lib_file = find_library('csearch')
-lib      = CDLL( lib_file )
-
+from array import array
+from collections import namedtuple, OrderedDict
+from heapq import heappush, heappop
+from operator import itemgetter, ne
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import timeit
+import weakref
 
 state_hash_fxn       = CFUNCTYPE( c_size_t, py_object )
 compare_fxn          = CFUNCTYPE( c_int, py_object, py_object )
@@ -31,218 +41,2303 @@ cost_fxn             = CFUNCTYPE( c_int, py_object, py_object )
 nonnegative_cost_fxn = CFUNCTYPE( c_uint, py_object, py_object )
 successors_fxn       = CFUNCTYPE( None, py_object, c_void_p )
 
+# Look up a libcsearch symbol and give it its prototype. This is
+# done once, when the library is loaded, rather than on every call.
+def _bind( lib, name, restype, argtypes ):
+	fxn          = getattr( lib, name )
+	fxn.restype  = restype
+	fxn.argtypes = argtypes
+	return fxn
+
+#  Native Function Table
+#
+#  The typed libcsearch functions for one algorithm. The three
+#  algorithms share the same function names behind a prefix
+#  (bestfs_, dijkstra_ and astar_), so one table type covers
+#  all of them.
+class _NativeTable( object ):
+	def __init__( self, lib, prefix, cost_type ):
+		self.cost_type = cost_type
+		self.create    = _bind( lib, prefix + '_create', c_void_p, [compare_fxn, state_hash_fxn, heuristic_fxn, cost_type, successors_fxn] )
+		self.destroy   = _bind( lib, prefix + '_destroy', None, [c_void_p] )
+		self.cleanup   = _bind( lib, prefix + '_cleanup', None, [c_void_p] )
+		self.find      = _bind( lib, prefix + '_find', c_bool, [c_void_p, py_object, py_object] )
+
+		self.set_compare_fxn    = _bind( lib, prefix + '_set_compare_fxn', None, [c_void_p, compare_fxn] )
+		self.set_successors_fxn = _bind( lib, prefix + '_set_successors_fxn', None, [c_void_p, successors_fxn] )
+		if prefix != 'dijkstra':
+			self.set_heuristic_fxn = _bind( lib, prefix + '_set_heuristic_fxn', None, [c_void_p, heuristic_fxn] )
+		if prefix != 'bestfs':
+			self.set_cost_fxn = _bind( lib, prefix + '_set_cost_fxn', None, [c_void_p, cost_type] )
+
+		self.first_node = _bind( lib, prefix + '_first_node', c_void_p, [c_void_p] )
+		self.next_node  = _bind( lib, prefix + '_next_node', c_void_p, [c_void_p] )
+		# A py_object restype would take ownership of the returned
+		# reference, but libcsearch returns a borrowed one.
+		self.state      = _bind( lib, prefix + '_state', c_void_p, [c_void_p] )
+
+		self.iterative_init    = _bind( lib, prefix + '_iterative_init', None, [c_void_p, py_object, py_object, POINTER(c_bool)] )
+		self.iterative_find    = _bind( lib, prefix + '_iterative_find', None, [c_void_p, py_object, py_object, POINTER(c_bool)] )
+		self.iterative_is_done = _bind( lib, prefix + '_iterative_is_done', c_bool, [c_void_p, POINTER(c_bool)] )
+
+#  Native Library
+#
+#  libcsearch is not looked for when this module is imported, since
+#  find_library can run ldconfig or a compiler and a missing library
+#  should not stop the Python engine from working. It is resolved the
+#  first time a search needs to know which engine to run on, in this
+#  order:
+#
+#    1. the path given to set_library,
+#    2. the CSEARCH_LIBRARY environment variable,
+#    3. the file named by the CSEARCH_LIBRARY_CACHE environment
+#       variable, which holds the path found by an earlier process,
+#    4. find_library('csearch'), whose answer is then written to that
+#       file, when it is named.
+#
+#  An empty path in 1 or 2 means no library: every search runs on
+#  the Python engine and nothing is looked up.
+class _NativeLibrary( object ):
+	def __init__( self, path ):
+		self.path   = path
+		self.lib    = CDLL( path )
+		self.tables = {
+			'bestfs':   _NativeTable( self.lib, 'bestfs', cost_fxn ),
+			'dijkstra': _NativeTable( self.lib, 'dijkstra', nonnegative_cost_fxn ),
+			'astar':    _NativeTable( self.lib, 'astar', cost_fxn ),
+		}
+
+		self.successors_push   = _bind( self.lib, 'successors_push', c_bool, [c_void_p, py_object] )
+		self.successors_pop    = _bind( self.lib, 'successors_pop', c_bool, [c_void_p] )
+		self.successors_resize = _bind( self.lib, 'successors_resize', c_bool, [c_void_p, c_uint] )
+		self.successors_clear  = _bind( self.lib, 'successors_clear', None, [c_void_p] )
+
+_native        = None
+_resolved      = False
+_library_path  = None
+_library_given = False
+
+def _read_library_cache( filename ):
+	try:
+		with open( filename ) as f:
+			return f.read( ).strip( ) or None
+	except (IOError, OSError):
+		return None
+
+# Written to a temporary file and renamed into place, so a process
+# never reads a half written path. A cache that cannot be written
+# only costs the next process a find_library.
+def _write_library_cache( filename, path ):
+	try:
+		directory = os.path.dirname( os.path.abspath( filename ) )
+		fd, temporary = tempfile.mkstemp( dir = directory )
+		with os.fdopen( fd, 'w' ) as f:
+			f.write( path + '\n' )
+		os.rename( temporary, filename )
+	except (IOError, OSError):
+		pass
+
+def _find_native():
+	if _library_given:
+		return _NativeLibrary( _library_path ) if _library_path else None
+	path = os.environ.get( 'CSEARCH_LIBRARY' )
+	if path is not None:
+		return _NativeLibrary( path ) if path else None
+
+	cache = os.environ.get( 'CSEARCH_LIBRARY_CACHE' )
+	if cache:
+		path = _read_library_cache( cache )
+		if path is not None:
+			try:
+				return _NativeLibrary( path )
+			except OSError:
+				pass
+	path = find_library( 'csearch' )
+	if path is None:
+		return None
+	native = _NativeLibrary( path )
+	if cache:
+		_write_library_cache( cache, path )
+	return native
+
+# The loaded libcsearch, or None when there is none, resolved on the
+# first call.
+def _load_native():
+	global _native, _resolved
+	if not _resolved:
+		_native   = _find_native( )
+		_resolved = True
+	return _native
+
+# Use the libcsearch at path for searches created from now on, or no
+# library at all when path is None or empty. The path is loaded when
+# the next search is created. Searches already created keep the
+# engine they have.
+def set_library( path ):
+	global _native, _resolved, _library_path, _library_given
+	_native        = None
+	_resolved      = False
+	_library_path  = path
+	_library_given = True
+
+# The path of the loaded libcsearch, or None when searches run on the
+# Python engine. This resolves the library if nothing has yet.
+def library_path():
+	native = _load_native( )
+	return native.path if native is not None else None
+
+# The ctypes handle of libcsearch, or None.
+def native_library():
+	native = _load_native( )
+	return native.lib if native is not None else None
+
+# lib and lib_file were loaded at import before the library was
+# resolved lazily, and are still answered on Python 3.7 and later.
+def __getattr__( name ):
+	if name == 'lib':
+		return native_library( )
+	if name == 'lib_file':
+		return library_path( )
+	raise AttributeError( "module {!r} has no attribute {!r}".format( __name__, name ) )
+
+BACKEND_NATIVE = 'native'
+BACKEND_PYTHON = 'python'
+
+# Decide whether a search should run on the Python engine. When no
+# backend is requested, libcsearch is used if it could be loaded.
+def _use_python_backend( backend ):
+	if backend == None:
+		return _load_native( ) is None
+	elif backend == BACKEND_PYTHON:
+		return True
+	elif backend == BACKEND_NATIVE:
+		if _load_native( ) is None:
+			raise OSError( "libcsearch could not be found" )
+		return False
+	else:
+		raise ValueError( "unknown backend: {}".format( backend ) )
+
+# The backend searches run on when none is requested.
+def default_backend():
+	return BACKEND_PYTHON if _use_python_backend( None ) else BACKEND_NATIVE
+
+# The Python engine hands successors_of a plain list where
+# libcsearch would hand it a successors handle.
+class _PythonSuccessors( list ):
+	pass
+
+# libcsearch keeps no references to the states it is given. While
+# a native search is calling successors_of, the list that keeps its
+# states alive is found here by successors handle, so that pushed
+# states are held until the search is cleaned up, along with the
+# library the search was created with, which set_library does not
+# change.
+_pinned_states = {}
+
 class Successors:
 	handle = None
+	states = None
+	native = None
 
 	def __init__( self, handle ):
 		self.handle = handle
+		if not isinstance( handle, _PythonSuccessors ):
+			self.states, self.native = _pinned_states.get( handle, (None, None) )
+			if self.native is None:
+				self.native = _load_native( )
 
 	def push( self, state ):
-		lib.successors_push.restype  = c_bool
-		lib.successors_push.argtypes = [c_void_p, py_object]
-		return lib.successors_push( self.handle, py_object(state) )
+		if isinstance( self.handle, _PythonSuccessors ):
+			self.handle.append( state )
+			return True
+		if self.states is not None:
+			self.states.append( state )
+		return self.native.successors_push( self.handle, state )
 
 	def pop( self ):
-		lib.successors_pop.restype  = c_bool
-		lib.successors_pop.argtypes = [c_void_p]
-		return lib.successors_pop( self.handle )
+		if isinstance( self.handle, _PythonSuccessors ):
+			if len(self.handle) == 0:
+				return False
+			self.handle.pop( )
+			return True
+		return self.native.successors_pop( self.handle )
 
 	def resize( self, new_size ):
-		lib.successors_resize.restype  = c_bool
-		lib.successors_resize.argtypes = [c_void_p, c_uint]
-		return lib.successors_resize( self.handle, new_size )
+		if isinstance( self.handle, _PythonSuccessors ):
+			return True
+		return self.native.successors_resize( self.handle, new_size )
 
 	def clear( self ):
-		lib.successors_clear.restype  = None
-		lib.successors_clear.argtypes = [c_void_p]
-		return lib.successors_clear( self.handle )
+		if isinstance( self.handle, _PythonSuccessors ):
+			del self.handle[:]
+			return
+		return self.native.successors_clear( self.handle )
 
 
-#  Best First Search Algorithm
+# Value states are compared with != and hashed with the built-in hash.
+def _value_compare( compare ):
+	return compare if compare != None else ne
+
+def _value_hasher( state_hasher ):
+	return state_hasher if state_hasher != None else hash
+
+# Passes the found argument of the iterative methods, a c_bool, to
+# libcsearch as a bool*.
+def _found_ref( found ):
+	return byref( found ) if found != None else None
+
+#  Native Search Engine
 #
-#  Best-first search is a method of combinatorial search where
-#  a heuristic function is used to guide the search toward the
-#  goal. The heuristic function takes two nodes as input and
-#  evaluates how likely that node will lead toward the goal.
-class BestFirstSearch:
-	handle = None
-	node = None
-	compare = None
-	state_hasher = None
-	heuristic = None
-	successors_of = None
+#  Runs a search in libcsearch through one of the function tables.
+#  The callbacks are kept here as ctypes function pointers so that
+#  they live as long as the native handle that calls them. A missing
+#  heuristic or cost function is passed as a NULL function pointer.
+#  For value states, with no compare or hash function, the built-in
+#  hash and != are handed to libcsearch, so its callbacks never run
+#  Python code.
+#
+#  libcsearch keeps no references to states, so every state handed
+#  to it, whether a start or end state, pushed or returned by the
+#  successors function, is held in states until cleanup or destroy.
+#
+#  A successors function may push each state through Successors or
+#  return all of them as an iterable. Returned states are pushed in
+#  one loop over the bound successors_push.
+class _NativeSearch( object ):
+	def __init__( self, native, table, compare, state_hasher, heuristic, cost, successors_of ):
+		self.native        = native
+		self.table         = table
+		self.compare       = compare_fxn(_value_compare( compare ))
+		self.state_hasher  = state_hash_fxn(_value_hasher( state_hasher ))
+		self.heuristic     = heuristic_fxn(heuristic) if heuristic != None else heuristic_fxn()
+		self.cost          = table.cost_type(cost) if cost != None else table.cost_type()
+		self.cost_function = cost
+		self.states        = []
+		self.successors_of = successors_fxn(self.successors_trampoline( successors_of ))
+		self.handle        = table.create( self.compare, self.state_hasher, self.heuristic, self.cost, self.successors_of )
 
-	def __init__( self, compare, state_hasher, heuristic, successors_of ):
-		self.compare       = compare_fxn(compare)
-		self.state_hasher  = state_hash_fxn(state_hasher)
-		self.heuristic     = heuristic_fxn(heuristic)
-		self.successors_of = successors_fxn(successors_of)
+	def successors_trampoline( self, successors_of ):
+		states = self.states
+		pinned = (states, self.native)
+		push   = self.native.successors_push
+		def successors( state, handle ):
+			_pinned_states[ handle ] = pinned
+			try:
+				children = successors_of( state, handle )
+			finally:
+				del _pinned_states[ handle ]
+			if children is not None:
+				children = list(children)
+				states.extend( children )
+				for child in children:
+					push( handle, child )
+		return successors
 
-		lib.bestfs_create.restype  = c_void_p
-		lib.bestfs_create.argtypes = [compare_fxn, state_hash_fxn, heuristic_fxn, cost_fxn, successors_fxn]
-		self.handle = lib.bestfs_create( self.compare, self.state_hasher, self.heuristic, self.cost, self.successors_of )
+	def destroy( self ):
+		self.table.destroy( self.handle )
+		del self.states[:]
 
-	def __deinit__( self ):
-		lib.bestfs_destroy.restype  = None
-		lib.bestfs_destroy.argtypes = [c_void_p]
-		lib.bestfs_destroy( self.handle )
+	def set_compare_fxn( self, fxn ):
+		self.compare = compare_fxn(_value_compare( fxn ))
+		self.table.set_compare_fxn( self.handle, self.compare )
+		return self.compare
 
-	def setCompareFunction( self, fxn ):
-		self.compare = compare_fxn(fxn)
-		lib.bestfs_set_compare_fxn.restype = None
-		lib.bestfs_set_compare_fxn.argtypes = [c_void_p, compare_fxn]
-		lib.bestfs_set_compare_fxn( self.handle, self.compare )
+	def set_heuristic_fxn( self, fxn ):
+		self.heuristic = heuristic_fxn(fxn)
+		self.table.set_heuristic_fxn( self.handle, self.heuristic )
+		return self.heuristic
 
-	def setHeuristicFunction( self, fxn ):
-		self.state_hasher = state_hash_fxn(fxn)
-		lib.bestfs_set_heuristic_fxn.restype = None
-		lib.bestfs_set_heuristic_fxn.argtypes = [c_void_p, heuristic_fxn]
-		lib.bestfs_set_heuristic_fxn( self.handle, self.state_hasher )
+	def set_cost_fxn( self, fxn ):
+		self.cost          = self.table.cost_type(fxn)
+		self.cost_function = fxn
+		self.table.set_cost_fxn( self.handle, self.cost )
+		return self.cost
 
-	def setSuccessorsFunction( self, fxn ):
-		self.successors_of = successors_fxn(fxn)
-		lib.bestfs_set_successors_fxn.restype = None
-		lib.bestfs_set_successors_fxn.argtypes = [c_void_p, successors_fxn]
-		lib.bestfs_set_successors_fxn( self.handle, self.successors_of )
+	def set_successors_fxn( self, fxn ):
+		self.successors_of = successors_fxn(self.successors_trampoline( fxn ))
+		self.table.set_successors_fxn( self.handle, self.successors_of )
+		return self.successors_of
+
+	# libcsearch has no setter for the hash function, so the native
+	# search is created again around the new one. Any search in
+	# progress is lost.
+	def set_state_hasher_fxn( self, fxn ):
+		self.state_hasher = state_hash_fxn(_value_hasher( fxn ))
+		self.table.destroy( self.handle )
+		del self.states[:]
+		self.handle = self.table.create( self.compare, self.state_hasher, self.heuristic, self.cost, self.successors_of )
+		return self.state_hasher
+
+	# libcsearch does not report the size of its open and closed sets.
+	def sizes( self ):
+		return None
 
 	def cleanup( self ):
-		lib.bestfs_cleanup.restype  = None
-		lib.bestfs_cleanup.argtypes = [c_void_p]
-		lib.bestfs_cleanup( self.handle )
+		self.table.cleanup( self.handle )
+		del self.states[:]
 
 	def find( self, start, end ):
-		lib.bestfs_find.restype  = c_bool
-		lib.bestfs_find.argtypes = [c_void_p, py_object, py_object]
-		return lib.bestfs_find( self.handle, py_object(start), py_object(end) )
+		self.states.append( start )
+		self.states.append( end )
+		return self.table.find( self.handle, start, end )
 
-	def __iter__( self ):
-		return self
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		first_node = self.table.first_node
+		next_node  = self.table.next_node
+		state      = self.table.state
+		states     = []
+
+		node = first_node( self.handle )
+		while node is not None:
+			states.append( cast( state( node ), py_object ).value )
+			node = next_node( node )
+		return states
 
-	def next( self ):
-		if self.node == None:
-			lib.bestfs_first_node.restype  = c_void_p
-			lib.bestfs_first_node.argtypes = [c_void_p]
-			self.node = lib.bestfs_first_node( self.handle )
+	# libcsearch does not report the cost of its path, so the cost
+	# function is summed over the steps of the extracted path.
+	def path_cost( self, path ):
+		if not path or self.cost_function == None:
+			return None
+		return sum( self.cost_function( path[ i + 1 ], path[ i ] ) for i in range(len(path) - 1) )
+
+	def iterative_init( self, start, end, found ):
+		self.states.append( start )
+		self.states.append( end )
+		self.table.iterative_init( self.handle, start, end, _found_ref( found ) )
+
+	def iterative_find( self, start, end, found ):
+		self.table.iterative_find( self.handle, start, end, _found_ref( found ) )
+
+	def iterative_is_done( self, found ):
+		return self.table.iterative_is_done( self.handle, _found_ref( found ) )
+
+	# libcsearch does not expose an unfinished search.
+	def partial_path( self ):
+		return []
+
+
+#  Python Search Engine
+#
+#  A search engine written only in Python, used when libcsearch
+#  is missing or when a search is created with backend='python'.
+#  The open set is a binary heap and the closed set, cost and
+#  parent tables are dictionaries. The callbacks are called
+#  directly, so no node expansion crosses into ctypes.
+#
+#  Nodes are ordered by g + h when both a cost and a heuristic
+#  function are given (A*), by g alone when there is no heuristic
+#  (Dijkstra) and by h alone when there is no cost (best-first).
+#
+#  States returned by the successors function go straight into the
+#  frontier; pushed states are collected in a list first.
+
+# Wraps a state so that dictionaries use the user's hash and
+# compare callbacks.
+class _StateKey( object ):
+	__slots__ = ('state', 'hash', 'compare')
+
+	def __init__( self, state, state_hasher, compare ):
+		self.state   = state
+		self.hash    = state_hasher( state )
+		self.compare = compare
+
+	def __hash__( self ):
+		return self.hash
+
+	def __eq__( self, other ):
+		return self.compare( self.state, other.state ) == 0
+
+	def __ne__( self, other ):
+		return self.compare( self.state, other.state ) != 0
+
+# Value states are their own keys, wrapped in a one-element tuple so
+# that key.state still works. Hashing and comparing the wrapper is
+# done by the tuple type in C, without calling back into Python.
+class _ValueKey( tuple ):
+	__slots__ = ()
+	state = property( itemgetter( 0 ) )
+
+def _value_key( state ):
+	return _ValueKey( (state,) )
+
+# The found argument of the iterative methods is a c_bool, as it
+# is a bool* in libcsearch.
+def _set_found( found, value ):
+	if found != None:
+		found.value = value
+
+class _PythonSearch( object ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of ):
+		self.compare       = compare
+		self.state_hasher  = state_hasher
+		self.heuristic     = heuristic
+		self.cost          = cost
+		self.successors_of = successors_of
+		self.choose_key( )
+		self.cleanup( )
+
+	def destroy( self ):
+		self.cleanup( )
+
+	# Without compare and hash functions, states are values and are
+	# keyed by _value_key, which shadows the key method.
+	def choose_key( self ):
+		if self.compare == None and self.state_hasher == None:
+			self.key = _value_key
 		else:
-			lib.bestfs_next_node.restype  = c_void_p
-			lib.bestfs_next_node.argtypes = [c_void_p]
-			self.node = lib.bestfs_next_node( self.node )
-
-		if self.node != None:
-			lib.bestfs_state.restype  = py_object
-			lib.bestfs_state.argtypes = [c_void_p]
-			state = lib.bestfs_state( self.node )
-			return state
+			self.__dict__.pop( 'key', None )
+
+	def set_compare_fxn( self, fxn ):
+		self.compare = fxn
+		self.choose_key( )
+		return fxn
+
+	def set_heuristic_fxn( self, fxn ):
+		self.heuristic = fxn
+		return fxn
+
+	def set_cost_fxn( self, fxn ):
+		self.cost = fxn
+		return fxn
+
+	def set_successors_fxn( self, fxn ):
+		self.successors_of = fxn
+		return fxn
+
+	def set_state_hasher_fxn( self, fxn ):
+		self.state_hasher = fxn
+		self.choose_key( )
+		return fxn
+
+	# The open set size counts stale heap entries not yet popped.
+	def sizes( self ):
+		return (len(self.open_set), len(self.closed))
+
+	def cleanup( self ):
+		self.open_set = []
+		self.closed   = set()
+		self.g        = {}
+		self.parents  = {}
+		self.counter  = 0
+		self.end      = None
+		self.goal     = None
+		self.done     = True
+
+	def key( self, state ):
+		return _StateKey( state, self.state_hasher, self.compare )
+
+	def push( self, key, g ):
+		if self.heuristic == None:
+			f = g
+		elif self.cost == None:
+			f = self.heuristic( key.state, self.end.state )
 		else:
-			raise StopIteration
+			f = g + self.heuristic( key.state, self.end.state )
+		self.counter += 1
+		heappush( self.open_set, (f, self.counter, g, key) )
 
+	def successors( self, state, successors_of = None ):
+		if successors_of == None:
+			successors_of = self.successors_of
+		successors = _PythonSuccessors()
+		children   = successors_of( state, successors )
+		if children is not None:
+			if successors:
+				successors.extend( children )
+			else:
+				successors = children
+		return successors
 
-	def iterativeInit( self, start, end, found ):
-		lib.bestfs_iterative_init.restype  = None
-		lib.bestfs_iterative_init.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.bestfs_iterative_init( self.handle, py_object(start), py_object(end), py_object(found) )
+	def expand( self, key ):
+		self.closed.add( key )
+		parent_g = self.g[ key ]
 
-	def iterativeFind( self, start, end, found ):
-		lib.bestfs_iterative_find.restype  = None
-		lib.bestfs_iterative_find.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.bestfs_iterative_find( self.handle, py_object(start), py_object(end), py_object(found) )
+		for state in self.successors( key.state ):
+			child = self.key( state )
+			if self.cost == None:
+				g = 0
+			else:
+				g = parent_g + self.cost( key.state, state )
 
-	def iterativeIsDone( self, found ):
-		lib.bestfs_iterative_is_done.restype  = c_bool
-		lib.bestfs_iterative_is_done.argtypes = [c_void_p, py_object]
-		return lib.bestfs_iterative_is_done( self.handle, py_object(found) )
+			if child in self.g and g >= self.g[ child ]:
+				continue
 
-#  Dijkstra's Algorithm
+			self.g[ child ]       = g
+			self.parents[ child ] = key
+			self.closed.discard( child )
+			self.push( child, g )
+
+	def iterative_init( self, start, end, found ):
+		self.cleanup( )
+		start_key = self.key( start )
+		self.end  = self.key( end )
+		self.done = False
+		self.g[ start_key ]       = 0
+		self.parents[ start_key ] = None
+		self.push( start_key, 0 )
+		_set_found( found, False )
+
+	# Expand one node.
+	def iterative_find( self, start, end, found ):
+		while self.open_set:
+			f, counter, g, key = heappop( self.open_set )
+			if g > self.g[ key ] or key in self.closed:
+				continue # stale entry
+
+			if key == self.end:
+				self.goal = key
+				self.done = True
+				_set_found( found, True )
+			else:
+				self.expand( key )
+			return
+
+		self.done = True
+		_set_found( found, False )
+
+	def iterative_is_done( self, found ):
+		return self.done
+
+	def find( self, start, end ):
+		self.iterative_init( start, end, None )
+		while not self.done:
+			self.iterative_find( start, end, None )
+		return self.goal is not None
+
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		parents = self.parents
+		states  = []
+
+		node = self.goal
+		while node is not None:
+			states.append( node.state )
+			node = parents[ node ]
+		return states
+
+	def path_cost( self, path ):
+		if self.goal is None or self.cost == None:
+			return None
+		return self.g[ self.goal ]
+
+	# The path to the closed state the heuristic rates closest to the
+	# end, ties going to the cheaper one, or the solution once found.
+	def partial_path( self ):
+		if self.goal is not None:
+			return self.path( )
+		return self.closest( self.closed or self.g, self.g, self.parents, self.end )
+
+	def closest( self, candidates, g, parents, end ):
+		if self.heuristic == None or not candidates:
+			return []
+		heuristic = self.heuristic
+		node = min( candidates, key = lambda key: (heuristic( key.state, end.state ), g[ key ]) )
+
+		states = []
+		while node is not None:
+			states.append( node.state )
+			node = parents[ node ]
+		return states
+
+	# Dijkstra's algorithm from start over every state it can reach,
+	# or until every state in goals is settled. States are numbered
+	# in the order they are settled; only the open states keep an
+	# entry in g and parents, which hold parent numbers.
+	def sweep( self, start, goals ):
+		key       = self.key
+		cost      = self.cost
+		remaining = set( key( goal ) for goal in goals ) if goals is not None else None
+		number    = {}
+		states    = []
+		distances = []
+		numbers   = []
+
+		start_key     = key( start )
+		g             = { start_key: 0 }
+		parents       = { start_key: -1 }
+		self.open_set = [ (0, 0, start_key) ]
+		self.closed   = number
+		counter       = 0
+		try:
+			while self.open_set:
+				distance, order, node = heappop( self.open_set )
+				if node in number or distance > g[ node ]:
+					continue # stale entry
+
+				index = len(states)
+				number[ node ] = index
+				states.append( node.state )
+				distances.append( distance )
+				numbers.append( parents.pop( node ) )
+				del g[ node ]
+				if remaining is not None:
+					remaining.discard( node )
+					if not remaining:
+						break
+
+				for state in self.successors( node.state ):
+					child = key( state )
+					if child in number:
+						continue
+					child_g = distance + cost( node.state, state )
+					if child in g and child_g >= g[ child ]:
+						continue
+					g[ child ]       = child_g
+					parents[ child ] = index
+					counter += 1
+					heappush( self.open_set, (child_g, counter, child) )
+		finally:
+			self.cleanup( )
+
+		return DistanceMap( states, _distance_array( distances ), array( 'l', numbers ), key, number )
+
+
+#  Bidirectional Search Engine
 #
-#  Dijkstra 's algorithm computes the shortest path between a
-#  start node and a goal node in a graph.
-class DijkstraSearch:
+#  Grows one frontier forward from the start state and one backward
+#  from the end state, expanding whichever has the smaller open set.
+#  When a state reached from one side is already known to the other,
+#  the two costs give a complete path, and the cheapest such path is
+#  kept. The search stops once no open state can lead to a cheaper
+#  one: for Dijkstra when the smallest costs of the two frontiers
+#  add up to at least the best path, and for A* when the smallest
+#  g + h of either frontier reaches it.
+#
+#  Going backward, the predecessors of a state are generated with
+#  predecessors_of, which defaults to successors_of for state spaces
+#  where every move can be undone. The heuristic estimates the
+#  distance to the start state on the backward side.
+_FORWARD  = 0
+_BACKWARD = 1
+
+class _BidirectionalSearch( _PythonSearch ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of, predecessors_of ):
+		self.predecessors_of = predecessors_of
+		_PythonSearch.__init__( self, compare, state_hasher, heuristic, cost, successors_of )
+
+	def set_predecessors_fxn( self, fxn ):
+		self.predecessors_of = fxn
+		return fxn
+
+	def sizes( self ):
+		return (len(self.open_sets[ _FORWARD ]) + len(self.open_sets[ _BACKWARD ]),
+		        len(self.closed[ _FORWARD ]) + len(self.closed[ _BACKWARD ]))
+
+	def cleanup( self ):
+		self.open_sets = ([], [])
+		self.closed    = (set(), set())
+		self.g         = ({}, {})
+		self.parents   = ({}, {})
+		self.targets   = (None, None)
+		self.counter   = 0
+		self.best      = None
+		self.meeting   = None
+		self.done      = True
+
+	def push( self, side, key, g ):
+		f = g
+		if self.heuristic != None:
+			f += self.heuristic( key.state, self.targets[ side ].state )
+		self.counter += 1
+		heappush( self.open_sets[ side ], (f, self.counter, g, key) )
+
+	# The smallest open entry of one side, after dropping stale ones.
+	def top( self, side ):
+		open_set = self.open_sets[ side ]
+		g        = self.g[ side ]
+		closed   = self.closed[ side ]
+		while open_set:
+			entry = open_set[ 0 ]
+			if entry[ 2 ] > g[ entry[ 3 ] ] or entry[ 3 ] in closed:
+				heappop( open_set )
+			else:
+				return entry
+		return None
+
+	def expand( self, side ):
+		f, counter, g, key = heappop( self.open_sets[ side ] )
+		self.closed[ side ].add( key )
+
+		gs      = self.g[ side ]
+		parents = self.parents[ side ]
+		others  = self.g[ 1 - side ]
+		if side == _FORWARD:
+			neighbors = self.successors( key.state )
+		else:
+			neighbors = self.successors( key.state, self.predecessors_of )
+
+		for state in neighbors:
+			child = self.key( state )
+			if side == _FORWARD:
+				child_g = g + self.cost( key.state, state )
+			else:
+				child_g = g + self.cost( state, key.state )
+
+			if child in gs and child_g >= gs[ child ]:
+				continue
+
+			gs[ child ]      = child_g
+			parents[ child ] = key
+			self.closed[ side ].discard( child )
+			self.push( side, child, child_g )
+
+			if child in others and (self.best is None or child_g + others[ child ] < self.best):
+				self.best    = child_g + others[ child ]
+				self.meeting = child
+
+	def iterative_init( self, start, end, found ):
+		self.cleanup( )
+		start_key    = self.key( start )
+		end_key      = self.key( end )
+		self.targets = (end_key, start_key)
+		self.done    = False
+
+		for side, key in ((_FORWARD, start_key), (_BACKWARD, end_key)):
+			self.g[ side ][ key ]       = 0
+			self.parents[ side ][ key ] = None
+			self.push( side, key, 0 )
+
+		if start_key == end_key:
+			self.best    = 0
+			self.meeting = start_key
+		_set_found( found, False )
+
+	# Expand one node, from whichever side has fewer open states.
+	def iterative_find( self, start, end, found ):
+		if self.done:
+			return
+
+		forward  = self.top( _FORWARD )
+		backward = self.top( _BACKWARD )
+		if forward is None or backward is None:
+			self.done = True
+		elif self.best is not None:
+			if self.heuristic == None:
+				bound = forward[ 2 ] + backward[ 2 ]
+			else:
+				bound = max( forward[ 0 ], backward[ 0 ] )
+			self.done = bound >= self.best
+
+		if self.done:
+			_set_found( found, self.best is not None )
+			return
+
+		if len(self.open_sets[ _FORWARD ]) <= len(self.open_sets[ _BACKWARD ]):
+			self.expand( _FORWARD )
+		else:
+			self.expand( _BACKWARD )
+
+	def find( self, start, end ):
+		self.iterative_init( start, end, None )
+		while not self.done:
+			self.iterative_find( start, end, None )
+		return self.best is not None
+
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		if self.meeting is None:
+			return []
+
+		states = []
+		node = self.meeting
+		while node is not None:
+			states.append( node.state )
+			node = self.parents[ _FORWARD ][ node ]
+		states.reverse( )
+
+		node = self.parents[ _BACKWARD ][ self.meeting ]
+		while node is not None:
+			states.append( node.state )
+			node = self.parents[ _BACKWARD ][ node ]
+
+		states.reverse( )
+		return states
+
+	def path_cost( self, path ):
+		return self.best
+
+	# Before the two sides meet, only the forward side has a path
+	# from the start.
+	def partial_path( self ):
+		if self.meeting is not None:
+			return self.path( )
+		return self.closest( self.closed[ _FORWARD ] or self.g[ _FORWARD ], self.g[ _FORWARD ], self.parents[ _FORWARD ], self.targets[ _FORWARD ] )
+
+
+#  Distance Cache
+#
+#  Exact distances to a goal, learned by earlier searches toward it
+#  and reused by later ones. For each goal the cache keeps, for every
+#  state it knows, the cost of a shortest path from that state to the
+#  goal and the next state along that path.
+#
+#  A cached search orders a known state by its g plus its exact
+#  distance instead of its heuristic, and stops as soon as it takes a
+#  known state off the open set: no open state can lead to a cheaper
+#  path, so the path so far plus the cached tail is a shortest one.
+#  This holds for any admissible heuristic. After a search every
+#  state on the solution learns its distance, so repeated queries
+#  toward the same goal end in ever shorter tail searches.
+#
+#  fill runs Dijkstra's algorithm backward from the goal and stores
+#  the distance of every state that can reach it, which turns every
+#  later query into a lookup. The predecessors of a state default to
+#  its successors, as for bidirectional search.
+#
+#  The distances are only valid for the cost and successors functions
+#  that produced them, so changing either clears the cache.
+class DistanceCache( object ):
+	def __init__( self ):
+		self.tables = {}
+
+	# The table of known states for a goal, given as a state key.
+	# Each entry holds (distance, next state key).
+	def table( self, goal ):
+		table = self.tables.get( goal )
+		if table is None:
+			table = { goal: (0, None) }
+			self.tables[ goal ] = table
+		return table
+
+	def clear( self ):
+		self.tables.clear( )
+
+	# The number of states known, over all goals.
+	def __len__( self ):
+		return sum( len(table) for table in self.tables.values() )
+
+class _CachedSearch( _PythonSearch ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of, cache ):
+		self.cache = cache
+		self.known = {}
+		_PythonSearch.__init__( self, compare, state_hasher, heuristic, cost, successors_of )
+
+	def push( self, key, g ):
+		known = self.known.get( key )
+		if known is not None:
+			f = g + known[ 0 ]
+		elif self.heuristic == None:
+			f = g
+		else:
+			f = g + self.heuristic( key.state, self.end.state )
+		self.counter += 1
+		heappush( self.open_set, (f, self.counter, g, key) )
+
+	def iterative_init( self, start, end, found ):
+		self.known = self.cache.table( self.key( end ) )
+		_PythonSearch.iterative_init( self, start, end, found )
+
+	# Expand one node. The search ends on any state whose distance to
+	# the goal is known, the goal itself included.
+	def iterative_find( self, start, end, found ):
+		while self.open_set:
+			f, counter, g, key = heappop( self.open_set )
+			if g > self.g[ key ] or key in self.closed:
+				continue # stale entry
+
+			if key in self.known:
+				self.goal = key
+				self.done = True
+				self.learn( )
+				_set_found( found, True )
+			else:
+				self.expand( key )
+			return
+
+		self.done = True
+		_set_found( found, False )
+
+	# Every state on the path to the known state lies on a shortest
+	# path to the goal, so its distance is the remaining cost.
+	def learn( self ):
+		known   = self.known
+		g       = self.g
+		parents = self.parents
+		total   = g[ self.goal ] + known[ self.goal ][ 0 ]
+
+		node = self.goal
+		while parents[ node ] is not None:
+			parent = parents[ node ]
+			if parent not in known:
+				known[ parent ] = (total - g[ parent ], node)
+			node = parent
+
+	def fill( self, end, predecessors_of ):
+		if predecessors_of == None:
+			predecessors_of = self.successors_of
+		end_key  = self.key( end )
+		known    = {}
+		best     = { end_key: (0, None) }
+		open_set = [ (0, 0, end_key) ]
+		counter  = 0
+
+		while open_set:
+			distance, order, key = heappop( open_set )
+			if key in known:
+				continue
+			known[ key ] = best[ key ]
+
+			for state in self.successors( key.state, predecessors_of ):
+				child = self.key( state )
+				if child in known:
+					continue
+				child_distance = distance + self.cost( state, key.state )
+				if child not in best or child_distance < best[ child ][ 0 ]:
+					best[ child ] = (child_distance, key)
+					counter += 1
+					heappush( open_set, (child_distance, counter, child) )
+
+		self.cache.tables[ end_key ] = known
+		return len(known)
+
+	# The path runs from the end state back to the start state: the
+	# cached tail from the end to the known state, then the searched
+	# part back to the start.
+	def path( self ):
+		if self.goal is None:
+			return []
+
+		tail = []
+		node = self.known[ self.goal ][ 1 ]
+		while node is not None:
+			tail.append( node.state )
+			node = self.known[ node ][ 1 ]
+		tail.reverse( )
+		return tail + _PythonSearch.path( self )
+
+	def path_cost( self, path ):
+		if self.goal is None:
+			return None
+		return self.g[ self.goal ] + self.known[ self.goal ][ 0 ]
+
+
+#  Beam Search Engine
+#
+#  Best-first search with a bounded open set. Whenever the open set
+#  grows past twice the beam width it is cut back to the width, and
+#  whenever the open and closed sets together hold more than
+#  max_states, the open set is cut back to half of what room is left.
+#  The states cut off are those with the worst heuristic values, and
+#  they are dropped from every table. Expanded states are kept, for
+#  the path and duplicate checks, so the width alone bounds only the
+#  open set: a search that finds nothing still visits and keeps every
+#  state it can reach. Only max_states bounds memory. Cutting in
+#  batches keeps the cost of each cut spread over many expansions.
+#
+#  Cutting states can lose every path to the goal. When a search that
+#  cut states ends without a solution, it is started again with the
+#  width and max_states multiplied by widen, up to retries times.
+class _BeamSearch( _PythonSearch ):
+	def __init__( self, compare, state_hasher, heuristic, successors_of, width, max_states, retries, widen ):
+		self.beam_width      = width
+		self.beam_max_states = max_states
+		self.retries         = retries
+		self.widen           = widen
+		self.width           = width
+		self.max_states      = max_states
+		self.pruned          = 0
+		self.attempt_pruned  = 0
+		_PythonSearch.__init__( self, compare, state_hasher, heuristic, None, successors_of )
+
+	def expand( self, key ):
+		_PythonSearch.expand( self, key )
+		if self.width is not None and len(self.open_set) > 2 * self.width:
+			self.trim( self.width )
+		if self.max_states is not None and len(self.closed) + len(self.open_set) > self.max_states:
+			self.trim( (self.max_states - len(self.closed)) // 2 )
+
+	# Keep the best size open states. Entries are unique by counter,
+	# so sorting never compares states, and a sorted list is a heap.
+	def trim( self, size ):
+		closed = self.closed
+		live   = sorted( entry for entry in self.open_set if entry[ 3 ] not in closed )
+		size   = max( size, 0 )
+		for entry in live[ size: ]:
+			del self.g[ entry[ 3 ] ]
+			del self.parents[ entry[ 3 ] ]
+		if len(live) > size:
+			self.pruned         += len(live) - size
+			self.attempt_pruned += len(live) - size
+		self.open_set = live[ :size ]
+
+	def iterative_init( self, start, end, found ):
+		self.width          = self.beam_width
+		self.max_states     = self.beam_max_states
+		self.attempt        = 0
+		self.pruned         = 0
+		self.attempt_pruned = 0
+		_PythonSearch.iterative_init( self, start, end, found )
+
+	# Expand one node, and widen the beam and start over when the
+	# search failed after cutting states.
+	def iterative_find( self, start, end, found ):
+		_PythonSearch.iterative_find( self, start, end, found )
+		if self.done and self.goal is None and self.attempt_pruned > 0 and self.attempt < self.retries:
+			self.attempt += 1
+			if self.width is not None:
+				self.width *= self.widen
+			if self.max_states is not None:
+				self.max_states *= self.widen
+			self.attempt_pruned = 0
+			_PythonSearch.iterative_init( self, start, end, found )
+
+
+#  External Memory Search Engine
+#
+#  A* and Dijkstra for state spaces whose open and closed sets do not
+#  fit in memory. States are serialized to bytes, and everything the
+#  search keeps lives in files in a working directory:
+#
+#  - the open set is split into one bucket file per f value, and new
+#    states are appended to their bucket without any duplicate check;
+#  - the smallest bucket is read back in chunks, each chunk is sorted
+#    by state hash, and duplicates are dropped in one pass over it and
+#    against the closed set, which is where duplicate detection is
+#    delayed to;
+#  - the closed set is an open-addressing hash table of state hashes,
+#    distances and record offsets in a memory-mapped file, grown by
+#    doubling;
+#  - every closed state is appended to a log with the offset of its
+#    parent's record, from which the path is read back at the end.
+#
+#  Only one chunk is in memory at a time. Serialized states must be
+#  equal exactly when the states are, which holds for pickled tuples
+#  and numbers. The heuristic must be consistent, as a closed state is
+#  never reopened. Each iterative step expands one chunk, so the node
+#  budgets of iterativeRun, asyncsearch and the timeouts of solve_many
+#  are only checked between chunks; a smaller chunk makes them finer.
+class ExternalMemory( object ):
+	def __init__( self, directory = None, serialize = None, deserialize = None, chunk = 100000 ):
+		self.directory   = directory
+		self.serialize   = serialize if serialize != None else _pickle_dumps
+		self.deserialize = deserialize if deserialize != None else pickle.loads
+		self.chunk       = chunk
+
+def _pickle_dumps( state ):
+	return pickle.dumps( state, 2 )
+
+_HASH_MASK = (1 << 64) - 1
+
+# Costs that are not whole numbers can make thousands of f values,
+# so only this many bucket files are kept open, the most recently
+# written ones; the others are opened again to append to them.
+_OPEN_BUCKETS = 64
+
+# A bucket record: state hash, g, parent record offset, data length.
+_RECORD = struct.Struct( '<Qdqi' )
+
+# A closed set entry: state hash (0 when empty), record offset, g.
+_ENTRY = struct.Struct( '<Qqd' )
+
+# A state log record: parent record offset, data length.
+_LOGGED = struct.Struct( '<qi' )
+
+class _StateLog( object ):
+	def __init__( self, filename ):
+		self.file = open( filename, 'w+b' )
+
+	def append( self, parent, data ):
+		self.file.seek( 0, 2 )
+		offset = self.file.tell( )
+		self.file.write( _LOGGED.pack( parent, len(data) ) )
+		self.file.write( data )
+		return offset
+
+	def read( self, offset ):
+		self.file.seek( offset )
+		parent, length = _LOGGED.unpack( self.file.read( _LOGGED.size ) )
+		return parent, self.file.read( length )
+
+	def close( self ):
+		self.file.close( )
+
+class _ClosedTable( object ):
+	def __init__( self, directory, log, capacity = 1 << 16 ):
+		self.directory = directory
+		self.log       = log
+		self.count     = 0
+		self.file      = None
+		self.map       = None
+		self.allocate( capacity )
+
+	def allocate( self, capacity ):
+		self.capacity = capacity
+		self.mask     = capacity - 1
+		self.filename = os.path.join( self.directory, 'closed-{}'.format( capacity ) )
+		self.file     = open( self.filename, 'w+b' )
+		self.file.truncate( capacity * _ENTRY.size )
+		self.map      = mmap.mmap( self.file.fileno(), capacity * _ENTRY.size )
+
+	def contains( self, hash, data ):
+		map   = self.map
+		index = hash & self.mask
+		while True:
+			entry_hash, offset, g = _ENTRY.unpack_from( map, index * _ENTRY.size )
+			if entry_hash == 0:
+				return False
+			if entry_hash == hash and self.log.read( offset )[ 1 ] == data:
+				return True
+			index = (index + 1) & self.mask
+
+	def add( self, hash, offset, g ):
+		if 2 * (self.count + 1) > self.capacity:
+			self.grow( )
+		self.insert( hash, offset, g )
+		self.count += 1
+
+	def insert( self, hash, offset, g ):
+		map   = self.map
+		index = hash & self.mask
+		while _ENTRY.unpack_from( map, index * _ENTRY.size )[ 0 ] != 0:
+			index = (index + 1) & self.mask
+		_ENTRY.pack_into( map, index * _ENTRY.size, hash, offset, g )
+
+	def grow( self ):
+		old_map, old_file, old_filename, old_capacity = self.map, self.file, self.filename, self.capacity
+		self.allocate( 2 * old_capacity )
+		for index in range(old_capacity):
+			entry = _ENTRY.unpack_from( old_map, index * _ENTRY.size )
+			if entry[ 0 ] != 0:
+				self.insert( *entry )
+		old_map.close( )
+		old_file.close( )
+		os.remove( old_filename )
+
+	def close( self ):
+		self.map.close( )
+		self.file.close( )
+
+class _ExternalSearch( _PythonSearch ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of, external ):
+		self.external  = external
+		self.workdir   = None
+		self.finalizer = None
+		_PythonSearch.__init__( self, compare, state_hasher, heuristic, cost, successors_of )
+
+	def cleanup( self ):
+		if self.workdir is not None:
+			for writer in self.writers.values():
+				writer.close( )
+			if self.reader is not None:
+				self.reader.close( )
+			if self.closed is not None:
+				self.closed.close( )
+			if self.log is not None:
+				self.log.close( )
+			shutil.rmtree( self.workdir, True )
+			if self.finalizer is not None:
+				self.finalizer.detach( )
+		self.workdir   = None
+		self.finalizer = None
+		self.writers  = OrderedDict()
+		self.buckets  = {}
+		self.files    = 0
+		self.reader   = None
+		self.pending  = 0
+		self.closed   = None
+		self.log      = None
+		self.goal     = None
+		self.goal_g   = None
+		self.end      = None
+		self.done     = True
+
+	def sizes( self ):
+		return (self.pending, self.closed.count if self.closed is not None else 0)
+
+	# The work directory is removed by cleanup, and also when a step
+	# raises, since the search cannot go on from there. Should neither
+	# happen, it is removed once the engine is collected or the
+	# interpreter exits; Python 2 has no weakref.finalize for that.
+	def iterative_init( self, start, end, found ):
+		self.cleanup( )
+		self.workdir = tempfile.mkdtemp( prefix = 'csearch-', dir = self.external.directory )
+		if hasattr( weakref, 'finalize' ):
+			self.finalizer = weakref.finalize( self, shutil.rmtree, self.workdir, True )
+		try:
+			self.log      = _StateLog( os.path.join( self.workdir, 'states' ) )
+			self.closed   = _ClosedTable( self.workdir, self.log )
+			self.end      = end
+			self.end_data = self.external.serialize( end )
+			self.done     = False
+			self.spill( start, 0, -1 )
+		except BaseException:
+			self.cleanup( )
+			raise
+		_set_found( found, False )
+
+	# Append a state to the bucket of its f value.
+	def spill( self, state, g, parent ):
+		f = g
+		if self.heuristic != None:
+			f += self.heuristic( state, self.end )
+		writer = self.writers.pop( f, None )
+		if writer is None:
+			filename = self.buckets.get( f )
+			if filename is None:
+				self.files += 1
+				filename = os.path.join( self.workdir, 'bucket-{}'.format( self.files ) )
+				self.buckets[ f ] = filename
+			if len(self.writers) >= _OPEN_BUCKETS:
+				self.writers.popitem( last = False )[ 1 ].close( )
+			writer = open( filename, 'ab' )
+		self.writers[ f ] = writer
+
+		data = self.external.serialize( state )
+		hash = (_value_hasher( self.state_hasher )( state ) & _HASH_MASK) or 1
+		writer.write( _RECORD.pack( hash, g, parent, len(data) ) )
+		writer.write( data )
+		self.pending += 1
+
+	# The next chunk of records from the smallest bucket. States spilled
+	# into that bucket while it is being read go to a new file, which
+	# is read after it.
+	def next_chunk( self ):
+		while True:
+			if self.reader is None:
+				if not self.buckets:
+					return None
+				f      = min( self.buckets )
+				writer = self.writers.pop( f, None )
+				if writer is not None:
+					writer.close( )
+				self.reader = open( self.buckets.pop( f ), 'rb' )
+
+			records = []
+			while len(records) < self.external.chunk:
+				header = self.reader.read( _RECORD.size )
+				if not header:
+					break
+				hash, g, parent, length = _RECORD.unpack( header )
+				records.append( (hash, g, parent, self.reader.read( length )) )
+			if records:
+				self.pending -= len(records)
+				return records
+
+			self.reader.close( )
+			os.remove( self.reader.name )
+			self.reader = None
+
+	# Expand one chunk.
+	def iterative_find( self, start, end, found ):
+		if self.done:
+			return
+		try:
+			self.expand_chunk( found )
+		except BaseException:
+			self.cleanup( )
+			raise
+
+	def expand_chunk( self, found ):
+		records = self.next_chunk( )
+		if records is None:
+			self.done = True
+			_set_found( found, False )
+			return
+
+		records.sort( key = lambda record: (record[ 0 ], record[ 1 ]) )
+		deserialize = self.external.deserialize
+		previous    = None
+		for hash, g, parent, data in records:
+			if previous is not None and previous[ 0 ] == hash and previous[ 1 ] == data:
+				continue
+			previous = (hash, data)
+			if self.closed.contains( hash, data ):
+				continue
+
+			offset = self.log.append( parent, data )
+			self.closed.add( hash, offset, g )
+			if data == self.end_data:
+				self.goal   = offset
+				self.goal_g = g
+				self.done   = True
+				_set_found( found, True )
+				return
+
+			state = deserialize( data )
+			for child in self.successors( state ):
+				self.spill( child, g + self.cost( state, child ), offset )
+
+	def find( self, start, end ):
+		self.iterative_init( start, end, None )
+		while not self.done:
+			self.iterative_find( start, end, None )
+		return self.goal is not None
+
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		deserialize = self.external.deserialize
+		states      = []
+
+		offset = self.goal
+		while offset is not None and offset >= 0:
+			offset, data = self.log.read( offset )
+			states.append( deserialize( data ) )
+		return states
+
+	# Records hold g as a double, so the cost is summed over the path
+	# to keep the type the cost function returns.
+	def path_cost( self, path ):
+		if self.goal is None:
+			return None
+		return sum( self.cost( path[ i + 1 ], path[ i ] ) for i in range(len(path) - 1) )
+
+	def partial_path( self ):
+		return self.path( ) if self.goal is not None else []
+
+
+#  Indexed Search Engine
+#
+#  For finite state spaces whose states can be numbered densely, such
+#  as sliding puzzles by the rank of their permutation. A StateIndexer
+#  maps every state to a distinct integer below size and back. The
+#  closed set is then a bytearray and the costs and parents are flat
+#  arrays, all indexed by that number, so a visited state takes 17
+#  bytes instead of a dictionary entry and a state key, and a
+#  duplicate check is one array read. The compare and hash functions
+#  are never called.
+#
+#  The tables span the whole state space, which suits spaces of up to
+#  a few million states. They are allocated by the first search and
+#  kept until destroy; cleanup resets only the entries a search
+#  touched, unless it touched so many that allocating them again is
+#  cheaper.
+class StateIndexer( object ):
+	def __init__( self, size, index, state ):
+		self.size  = size
+		self.index = index
+		self.state = state
+
+class _IndexedSearch( _PythonSearch ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of, indexer ):
+		self.indexer = indexer
+		self.g       = None
+		_PythonSearch.__init__( self, compare, state_hasher, heuristic, cost, successors_of )
+
+	def destroy( self ):
+		self.cleanup( )
+		self.g = None
+
+	def reset_tables( self ):
+		size = self.indexer.size
+		if self.g is None or 8 * len(self.touched) > size:
+			self.closed  = bytearray( size )
+			self.g       = array( 'd', [ float('inf') ] ) * size
+			self.parents = array( 'l', [ -1 ] ) * size
+		else:
+			closed  = self.closed
+			gs      = self.g
+			parents = self.parents
+			inf     = float('inf')
+			for index in self.touched:
+				closed[ index ]  = 0
+				gs[ index ]      = inf
+				parents[ index ] = -1
+		self.touched = []
+
+	def cleanup( self ):
+		if self.g is not None:
+			self.reset_tables( )
+		self.open_set     = []
+		self.closed_count = 0
+		self.touched      = []
+		self.counter      = 0
+		self.end          = None
+		self.end_index    = None
+		self.goal         = None
+		self.done         = True
+
+	def sizes( self ):
+		return (len(self.open_set), self.closed_count)
+
+	def push( self, index, state, g ):
+		if self.heuristic == None:
+			f = g
+		elif self.cost == None:
+			f = self.heuristic( state, self.end )
+		else:
+			f = g + self.heuristic( state, self.end )
+		self.counter += 1
+		heappush( self.open_set, (f, self.counter, g, index, state) )
+
+	# Open entries carry their state, so that only the states on the
+	# path are ever rebuilt from their index.
+	def expand( self, index, state ):
+		indexer = self.indexer
+		closed  = self.closed
+		gs      = self.g
+		parents = self.parents
+		cost    = self.cost
+		touched = self.touched
+		parent_g = gs[ index ]
+		closed[ index ] = 1
+		self.closed_count += 1
+
+		for child_state in self.successors( state ):
+			child = indexer.index( child_state )
+			if cost == None:
+				g = 0
+			else:
+				g = parent_g + cost( state, child_state )
+			if g >= gs[ child ]:
+				continue
+
+			gs[ child ]      = g
+			parents[ child ] = index
+			touched.append( child )
+			if closed[ child ]:
+				closed[ child ] = 0
+				self.closed_count -= 1
+			self.push( child, child_state, g )
+
+	def iterative_init( self, start, end, found ):
+		self.cleanup( )
+		if self.g is None:
+			self.reset_tables( )
+		self.end       = end
+		self.end_index = self.indexer.index( end )
+		self.done      = False
+
+		start_index = self.indexer.index( start )
+		self.g[ start_index ] = 0
+		self.touched.append( start_index )
+		self.push( start_index, start, 0 )
+		_set_found( found, False )
+
+	# Expand one node.
+	def iterative_find( self, start, end, found ):
+		while self.open_set:
+			f, counter, g, index, state = heappop( self.open_set )
+			if g > self.g[ index ] or self.closed[ index ]:
+				continue # stale entry
+
+			if index == self.end_index:
+				self.goal = index
+				self.done = True
+				_set_found( found, True )
+			else:
+				self.expand( index, state )
+			return
+
+		self.done = True
+		_set_found( found, False )
+
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		state   = self.indexer.state
+		parents = self.parents
+		states  = []
+
+		node = self.goal if self.goal is not None else -1
+		while node != -1:
+			states.append( state( node ) )
+			node = parents[ node ]
+		return states
+
+	# The cost table holds floats, so the cost is summed over the path
+	# to keep the type the cost function returns.
+	def path_cost( self, path ):
+		if self.goal is None or self.cost == None:
+			return None
+		return sum( self.cost( path[ i + 1 ], path[ i ] ) for i in range(len(path) - 1) )
+
+	# Scanning the closed set would touch the whole state space, so the
+	# open states are searched for the one closest to the end instead.
+	def partial_path( self ):
+		if self.goal is not None:
+			return self.path( )
+		if self.heuristic == None or not self.open_set:
+			return []
+		heuristic = self.heuristic
+		node      = min( self.open_set, key = lambda entry: (heuristic( entry[ 4 ], self.end ), entry[ 2 ]) )[ 3 ]
+
+		state  = self.indexer.state
+		states = []
+		while node != -1:
+			states.append( state( node ) )
+			node = self.parents[ node ]
+		return states
+
+
+#  Iterative Deepening A* Engine
+#
+#  A depth-first search that gives up on any path whose cost plus
+#  heuristic exceeds a threshold. Each iteration raises the threshold
+#  to the smallest value that was cut off, so the first solution found
+#  is optimal when the heuristic is admissible. Only the current path
+#  is kept, so memory grows with the solution depth instead of with
+#  the number of states seen. States are checked against the current
+#  path to avoid cycles.
+#
+#  The search runs in a generator that yields after every expansion,
+#  which is what the iterative methods step through.
+_no_state = object()
+
+class _IDAStarSearch( _PythonSearch ):
+	# Only the current path is kept, so there is no open or closed
+	# set to measure.
+	def sizes( self ):
+		return None
+
+	def cleanup( self ):
+		self.solution   = None
+		self.cost_total = None
+		self.iterations = []
+		self.stepper    = None
+		self.current    = []
+		self.done       = True
+
+	def search( self, start, end ):
+		heuristic = self.heuristic
+		cost      = self.cost
+		end_key   = self.key( end )
+		root      = self.key( start )
+		threshold = heuristic( start, end )
+
+		while True:
+			if root == end_key:
+				self.solution   = [ root ]
+				self.cost_total = 0
+				self.iterations.append( 0 )
+				return
+
+			path     = [ root ]
+			self.current = path
+			on_path  = set( path )
+			costs    = [ 0 ]
+			children = [ iter(self.successors( start )) ]
+			expanded = 1
+			next_threshold = None
+			yield
+
+			while children:
+				state = next( children[ -1 ], _no_state )
+				if state is _no_state:
+					children.pop( )
+					on_path.discard( path.pop( ) )
+					costs.pop( )
+					continue
+
+				child = self.key( state )
+				if child in on_path:
+					continue
+
+				g = costs[ -1 ] + cost( path[ -1 ].state, state )
+				f = g + heuristic( state, end )
+				if f > threshold:
+					if next_threshold is None or f < next_threshold:
+						next_threshold = f
+					continue
+
+				if child == end_key:
+					path.append( child )
+					self.solution   = path
+					self.cost_total = g
+					self.iterations.append( expanded )
+					return
+
+				path.append( child )
+				on_path.add( child )
+				costs.append( g )
+				children.append( iter(self.successors( state )) )
+				expanded += 1
+				yield
+
+			self.iterations.append( expanded )
+			if next_threshold is None:
+				return
+			threshold = next_threshold
+
+	def iterative_init( self, start, end, found ):
+		self.cleanup( )
+		self.stepper = self.search( start, end )
+		self.done    = False
+		_set_found( found, False )
+
+	# Expand one node.
+	def iterative_find( self, start, end, found ):
+		if self.done:
+			return
+		try:
+			next( self.stepper )
+		except StopIteration:
+			self.done = True
+			_set_found( found, self.solution is not None )
+
+	def find( self, start, end ):
+		self.cleanup( )
+		for step in self.search( start, end ):
+			pass
+		return self.solution is not None
+
+	# The path runs from the end state back to the start state.
+	def path( self ):
+		if self.solution is None:
+			return []
+		return [ key.state for key in reversed(self.solution) ]
+
+	def path_cost( self, path ):
+		return self.cost_total
+
+	# The path the depth-first search is on.
+	def partial_path( self ):
+		if self.solution is not None:
+			return self.path( )
+		return [ key.state for key in reversed(self.current) ]
+
+
+#  Distance Map
+#
+#  The distances from one source to every state a one-to-many
+#  Dijkstra search settled, from DijkstraSearch.findAll. The states
+#  are numbered in the order they were settled, so the source is 0.
+#  Distances are kept in one array, of whole numbers when every cost
+#  was a whole number, and the number of each state's parent in
+#  another, with -1 for the source. A path is only put together when
+#  it is asked for.
+#
+#  Looking a state up goes through a table from state to number, which
+#  a loaded map builds on the first lookup.
+_MAP_MAGIC  = b'CSDMAP\x01'
+_MAP_HEADER = struct.Struct( '<ccBBQ' )
+_MAP_LENGTH = struct.Struct( '<I' )
+
+# Whole number distances are kept as such, anything else as floats.
+def _distance_array( distances ):
+	try:
+		return array( 'l', distances )
+	except (TypeError, OverflowError):
+		return array( 'd', distances )
+
+class DistanceMap( object ):
+	def __init__( self, states, distances, parents, key, number = None ):
+		self.states    = states
+		self.distances = distances
+		self.parents   = parents
+		self.key       = key
+		self.number    = number
+
+	def __len__( self ):
+		return len(self.states)
+
+	def __contains__( self, state ):
+		return self.index( state ) is not None
+
+	# The number of a settled state, or None.
+	def index( self, state ):
+		if self.number is None:
+			key = self.key
+			self.number = dict( (key( settled ), index) for index, settled in enumerate(self.states) )
+		return self.number.get( self.key( state ) )
+
+	def source( self ):
+		return self.states[ 0 ]
+
+	# The distance of state from the source, or None when it was not
+	# settled.
+	def distance( self, state ):
+		index = self.index( state )
+		return self.distances[ index ] if index is not None else None
+
+	# The shortest path from the source to state, running from state
+	# back to the source as search paths do, or an empty list when
+	# state was not settled.
+	def path( self, state ):
+		index   = self.index( state )
+		parents = self.parents
+		states  = []
+		while index is not None and index >= 0:
+			states.append( self.states[ index ] )
+			index = parents[ index ]
+		return states
+
+	# Write the map to a file. States are written with serialize,
+	# pickle by default, and the arrays as they are in memory, with
+	# their byte order noted.
+	def save( self, filename, serialize = None ):
+		if serialize == None:
+			serialize = _pickle_dumps
+		with open( filename, 'wb' ) as f:
+			f.write( _MAP_MAGIC )
+			f.write( _MAP_HEADER.pack( self.distances.typecode.encode( 'ascii' ), self.parents.typecode.encode( 'ascii' ),
+				self.parents.itemsize, int(sys.byteorder == 'little'), len(self.states) ) )
+			self.distances.tofile( f )
+			self.parents.tofile( f )
+			for state in self.states:
+				data = serialize( state )
+				f.write( _MAP_LENGTH.pack( len(data) ) )
+				f.write( data )
+
+# Read a DistanceMap written by save. compare and state_hasher are
+# those of the search that made it, or None for value states.
+def load_distance_map( filename, compare = None, state_hasher = None, deserialize = None ):
+	if (compare == None) != (state_hasher == None):
+		raise ValueError( "compare and state_hasher must both be given, or both be None for value states" )
+	if deserialize == None:
+		deserialize = pickle.loads
+
+	with open( filename, 'rb' ) as f:
+		if f.read( len(_MAP_MAGIC) ) != _MAP_MAGIC:
+			raise ValueError( "{} is not a distance map".format( filename ) )
+		typecode, parent_typecode, itemsize, little, count = _MAP_HEADER.unpack( f.read( _MAP_HEADER.size ) )
+		distances = array( typecode.decode( 'ascii' ) )
+		parents   = array( parent_typecode.decode( 'ascii' ) )
+		if parents.itemsize != itemsize:
+			raise ValueError( "{} was saved with {}-byte parent numbers".format( filename, itemsize ) )
+		try:
+			distances.fromfile( f, count )
+			parents.fromfile( f, count )
+		except (EOFError, ValueError):
+			raise ValueError( "{} is truncated".format( filename ) )
+		if bool(little) != (sys.byteorder == 'little'):
+			distances.byteswap( )
+			parents.byteswap( )
+
+		states = []
+		for i in range(count):
+			data = f.read( _MAP_LENGTH.size )
+			if len(data) < _MAP_LENGTH.size:
+				raise ValueError( "{} is truncated".format( filename ) )
+			length, = _MAP_LENGTH.unpack( data )
+			states.append( deserialize( f.read( length ) ) )
+
+	if compare == None:
+		key = _value_key
+	else:
+		key = lambda state: _StateKey( state, state_hasher, compare )
+	return DistanceMap( states, distances, parents, key )
+
+
+#  Search Statistics
+#
+#  Counters and callback timings for the last search, collected only
+#  once enableStats has been called on a search. Collecting them swaps
+#  every callback for a timed wrapper, so a search without stats calls
+#  the functions it was given directly and pays nothing for them.
+#
+#  A node counts as expanded each time the successors function is
+#  called, and every state it pushes or returns counts as generated.
+#  The peak open and closed set sizes are sampled at each expansion
+#  on the Python engines; libcsearch does not expose them, so they
+#  stay None on the native engine, as they do for IDA*.
+#
+#  elapsed is the time spent in find, iterativeInit and iterativeFind.
+#  What overhead() leaves after the callbacks is the search itself
+#  and, on the native engine, the calls across ctypes.
+#
+#  progress, when given, is called with the stats every `every`
+#  expansions.
+_CALLBACKS = ('compare', 'state_hasher', 'heuristic', 'cost', 'successors_of')
+
+class SearchStats( object ):
+	def __init__( self, progress = None, every = 1000 ):
+		if every < 1:
+			raise ValueError( "every must be at least 1" )
+		self.progress = progress
+		self.every    = every
+		self.reset( )
+
+	def reset( self ):
+		self.expanded    = 0
+		self.generated   = 0
+		self.peak_open   = None
+		self.peak_closed = None
+		self.elapsed     = 0.0
+		self.calls       = dict( (name, 0) for name in _CALLBACKS )
+		self.times       = dict( (name, 0.0) for name in _CALLBACKS )
+
+	def overhead( self ):
+		return self.elapsed - sum( self.times.values() )
+
+	def __repr__( self ):
+		return "SearchStats(expanded={}, generated={}, peak_open={}, peak_closed={}, elapsed={:.6f})".format(
+			self.expanded, self.generated, self.peak_open, self.peak_closed, self.elapsed )
+
+def _timed( fxn, stats, name ):
+	timer = timeit.default_timer
+	def timed( *args ):
+		start = timer()
+		try:
+			return fxn( *args )
+		finally:
+			stats.times[ name ] += timer() - start
+			stats.calls[ name ] += 1
+	return timed
+
+# Pushed states are counted by how much the list they are pushed to
+# grows: the Python engine's successors list, or the list pinning
+# the native search's states.
+def _timed_successors( fxn, stats, sizes ):
+	timer = timeit.default_timer
+	def successors( state, handle ):
+		if isinstance( handle, _PythonSuccessors ):
+			pushed = handle
+		else:
+			pushed = _pinned_states.get( handle, ((),) )[ 0 ]
+		before = len(pushed)
+		start  = timer()
+		try:
+			children = fxn( state, handle )
+			if children is not None:
+				children = list(children)
+		finally:
+			stats.times[ 'successors_of' ] += timer() - start
+			stats.calls[ 'successors_of' ] += 1
+
+		stats.expanded  += 1
+		stats.generated += len(pushed) - before
+		if children is not None:
+			stats.generated += len(children)
+
+		counts = sizes( )
+		if counts is not None:
+			if stats.peak_open is None or counts[ 0 ] > stats.peak_open:
+				stats.peak_open = counts[ 0 ]
+			if stats.peak_closed is None or counts[ 1 ] > stats.peak_closed:
+				stats.peak_closed = counts[ 1 ]
+
+		if stats.progress is not None and stats.expanded % stats.every == 0:
+			stats.progress( stats )
+		return children
+	return successors
+
+#  Heuristic Cache
+#
+#  Remembers the heuristic values of the most recently scored states,
+#  so a state reached again through another parent is not scored
+#  again. States are looked up by their state_hasher value, and a hit
+#  is confirmed with compare; value states are looked up directly.
+#  Once size states are held, the least recently used one is dropped.
+#
+#  The values are only valid for one heuristic function and one goal,
+#  so the cache empties itself when either changes. hits and misses
+#  count the lookups since the cache was made.
+class HeuristicCache( object ):
+	def __init__( self, size = 65536 ):
+		if size < 1:
+			raise ValueError( "size must be at least 1" )
+		self.size      = size
+		self.entries   = OrderedDict()
+		self.heuristic = None
+		self.goal      = None
+		self.hits      = 0
+		self.misses    = 0
+
+	def clear( self ):
+		self.entries.clear( )
+		self.goal = None
+
+	def bind( self, heuristic ):
+		if heuristic is not self.heuristic:
+			self.clear( )
+			self.heuristic = heuristic
+
+	# Make goal the goal of the cached values, emptying the cache
+	# unless it is equal to the goal they were computed for.
+	def set_goal( self, goal, compare ):
+		if self.goal is not None:
+			if compare is None:
+				same = goal == self.goal
+			else:
+				same = compare( goal, self.goal ) == 0
+			if not same:
+				self.entries.clear( )
+		self.goal = goal
+
+	# The fraction of lookups answered from the cache.
+	def hit_rate( self ):
+		lookups = self.hits + self.misses
+		return float(self.hits) / lookups if lookups else 0.0
+
+	def __len__( self ):
+		return len(self.entries)
+
+	def __repr__( self ):
+		return "HeuristicCache(size={}, entries={}, hits={}, misses={})".format(
+			self.size, len(self.entries), self.hits, self.misses )
+
+# fxn behind cache. compare and state_hasher are read from functions
+# on every call, so they follow setCompareFunction. A cache shared by
+# searches with different heuristics is bound to whichever one last
+# used it, so no search reads values another heuristic produced.
+def _memoized( fxn, cache, functions, heuristic ):
+	entries = cache.entries
+	def memoized( state1, state2 ):
+		if cache.heuristic is not heuristic:
+			cache.bind( heuristic )
+		compare = functions[ 'compare' ]
+		if state2 is not cache.goal:
+			cache.set_goal( state2, compare )
+		if compare is None:
+			key = state1
+		else:
+			key = functions[ 'state_hasher' ]( state1 )
+
+		# Popping and putting back an entry moves it to the most
+		# recently used end.
+		entry = entries.pop( key, None )
+		if entry is not None and (compare is None or compare( entry[ 0 ], state1 ) == 0):
+			cache.hits += 1
+		else:
+			cache.misses += 1
+			entry = (state1, fxn( state1, state2 ))
+			if len(entries) >= cache.size:
+				entries.popitem( last = False )
+		entries[ key ] = entry
+		return entry[ 1 ]
+	return memoized
+
+#  Search
+#
+#  The interface shared by the search algorithms. Every call is
+#  passed on to the engine the search was created with, either
+#  libcsearch or the Python engine.
+#
+#  Passing None for both compare and state_hasher declares the states
+#  to be immutable hashable values, such as tuples, ints or strings.
+#  They are then compared and hashed by the built-in == and hash, and
+#  no compare or hash callback is made.
+class _Search:
 	handle = None
-	node = None
+	engine = None
+	solution = None
 	compare = None
 	state_hasher = None
 	heuristic = None
 	cost = None
 	successors_of = None
+	functions = None
+	stats = None
+	cache = None
+	heuristic_cache = None
+
+	def _create( self, prefix, compare, state_hasher, heuristic, cost, successors_of, backend ):
+		if _use_python_backend( backend ):
+			engine = _PythonSearch( compare, state_hasher, heuristic, cost, successors_of )
+		else:
+			engine = _NativeSearch( _native, _native.tables[ prefix ], compare, state_hasher, heuristic, cost, successors_of )
+		self._attach( engine, compare, state_hasher, heuristic, cost, successors_of )
+
+	# Attach an engine that only exists in Python, refusing a search
+	# that asked for libcsearch explicitly. mode names the feature in
+	# the error.
+	def _attach_python( self, mode, engine, backend, compare, state_hasher, heuristic, cost, successors_of ):
+		if backend != None and not _use_python_backend( backend ):
+			raise ValueError( "{} needs the Python backend".format( mode ) )
+		self._attach( engine, compare, state_hasher, heuristic, cost, successors_of )
+
+	def _create_bidirectional( self, compare, state_hasher, heuristic, cost, successors_of, predecessors_of, backend ):
+		engine = _BidirectionalSearch( compare, state_hasher, heuristic, cost, successors_of, predecessors_of )
+		self._attach_python( "bidirectional search", engine, backend, compare, state_hasher, heuristic, cost, successors_of )
+		self.functions[ 'predecessors_of' ] = predecessors_of
 
-	def __init__( self, compare, state_hasher, cost, successors_of ):
-		self.compare       = compare_fxn(compare)
-		self.state_hasher  = state_hash_fxn(state_hasher)
-		self.cost          = nonnegative_cost_fxn(cost)
-		self.successors_of = successors_fxn(successors_of)
+	def _create_cached( self, compare, state_hasher, heuristic, cost, successors_of, cache, backend ):
+		engine = _CachedSearch( compare, state_hasher, heuristic, cost, successors_of, cache )
+		self._attach_python( "a distance cache", engine, backend, compare, state_hasher, heuristic, cost, successors_of )
+		self.cache = cache
 
-		lib.dijkstra_create.restype  = c_void_p
-		lib.dijkstra_create.argtypes = [compare_fxn, state_hash_fxn, heuristic_fxn, cost_fxn, successors_fxn]
-		self.handle = lib.dijkstra_create( self.compare, self.state_hasher, self.heuristic, self.cost, self.successors_of )
+	def _create_external( self, compare, state_hasher, heuristic, cost, successors_of, external, backend ):
+		engine = _ExternalSearch( compare, state_hasher, heuristic, cost, successors_of, external )
+		self._attach_python( "external memory search", engine, backend, compare, state_hasher, heuristic, cost, successors_of )
+
+	def _create_indexed( self, compare, state_hasher, heuristic, cost, successors_of, indexer, backend ):
+		engine = _IndexedSearch( compare, state_hasher, heuristic, cost, successors_of, indexer )
+		self._attach_python( "indexed search", engine, backend, compare, state_hasher, heuristic, cost, successors_of )
+
+	def _invalidate_cache( self ):
+		if self.cache is not None:
+			self.cache.clear( )
+
+	def _use_heuristic_cache( self, heuristic_cache ):
+		self.heuristic_cache = heuristic_cache
+		if heuristic_cache is not None:
+			self.heuristic = self.engine.set_heuristic_fxn( self._instrument( 'heuristic', self.functions[ 'heuristic' ] ) )
+
+	def _invalidate_heuristic_cache( self ):
+		if self.heuristic_cache is not None:
+			self.heuristic_cache.clear( )
+
+	# The functions the search was given are kept in functions, so
+	# that they can be wrapped and unwrapped when stats are turned on
+	# and off.
+	def _attach( self, engine, compare, state_hasher, heuristic, cost, successors_of ):
+		if (compare == None) != (state_hasher == None):
+			raise ValueError( "compare and state_hasher must both be given, or both be None for value states" )
+		self.engine        = engine
+		self.handle        = getattr( engine, 'handle', None )
+		self.compare       = self.engine.compare
+		self.state_hasher  = self.engine.state_hasher
+		self.heuristic     = self.engine.heuristic
+		self.cost          = self.engine.cost
+		self.successors_of = self.engine.successors_of
+		self.functions     = {
+			'compare':       compare,
+			'state_hasher':  state_hasher,
+			'heuristic':     heuristic,
+			'cost':          cost,
+			'successors_of': successors_of,
+		}
 
 	def __deinit__( self ):
-		lib.dijkstra_destroy.restype  = None
-		lib.dijkstra_destroy.argtypes = [c_void_p]
-		lib.dijkstra_destroy( self.handle )
+		self.engine.destroy( )
 
-	def setCompareFunction( self, fxn ):
-		self.compare = compare_fxn(fxn)
-		lib.dijkstra_set_compare_fxn.restype = None
-		lib.dijkstra_set_compare_fxn.argtypes = [c_void_p, compare_fxn]
-		lib.dijkstra_set_compare_fxn( self.handle, self.compare )
+	# The function to hand the engine: fxn itself, or a timed wrapper
+	# around it while stats are being collected.
+	#
+	# A heuristic cache goes in front of the timed heuristic, so the
+	# stats count only the calls the cache could not answer.
+	def _instrument( self, name, fxn ):
+		self.functions[ name ] = fxn
+		if fxn == None:
+			return fxn
+		wrapped = fxn
+		if self.stats is not None:
+			if name == 'successors_of' or name == 'predecessors_of':
+				wrapped = _timed_successors( fxn, self.stats, self.engine.sizes )
+			else:
+				wrapped = _timed( fxn, self.stats, name )
+		if name == 'heuristic' and self.heuristic_cache is not None:
+			self.heuristic_cache.bind( fxn )
+			wrapped = _memoized( wrapped, self.heuristic_cache, self.functions, fxn )
+		return wrapped
 
-	def setCostFunction( self, fxn ):
-		self.cost = nonnegative_cost_fxn(fxn)
-		lib.dijkstra_set_cost_fxn.restype = None
-		lib.dijkstra_set_cost_fxn.argtypes = [c_void_p, compare_fxn]
-		lib.dijkstra_set_cost_fxn( self.handle, self.cost )
+	def _install_functions( self ):
+		engine    = self.engine
+		functions = self.functions
+		self.compare       = engine.set_compare_fxn( self._instrument( 'compare', functions[ 'compare' ] ) )
+		self.state_hasher  = engine.set_state_hasher_fxn( self._instrument( 'state_hasher', functions[ 'state_hasher' ] ) )
+		self.successors_of = engine.set_successors_fxn( self._instrument( 'successors_of', functions[ 'successors_of' ] ) )
+		if functions[ 'heuristic' ] != None:
+			self.heuristic = engine.set_heuristic_fxn( self._instrument( 'heuristic', functions[ 'heuristic' ] ) )
+		if functions[ 'cost' ] != None:
+			self.cost = engine.set_cost_fxn( self._instrument( 'cost', functions[ 'cost' ] ) )
+		if functions.get( 'predecessors_of' ) != None:
+			engine.set_predecessors_fxn( self._instrument( 'predecessors_of', functions[ 'predecessors_of' ] ) )
+		self.handle = getattr( engine, 'handle', None )
+
+	# Start collecting stats, which are reset at the start of every
+	# search. Call this between searches: on the native engine the
+	# search is created again to time the hash function.
+	def enableStats( self, progress = None, every = 1000 ):
+		self.stats = SearchStats( progress, every )
+		self._install_functions( )
+		return self.stats
+
+	def disableStats( self ):
+		self.stats = None
+		self._install_functions( )
+
+	# The stats of the last search, or None when they are off.
+	def searchStats( self ):
+		return self.stats
+
+	def _measure( self, fxn, *args ):
+		start = timeit.default_timer()
+		try:
+			return fxn( *args )
+		finally:
+			self.stats.elapsed += timeit.default_timer() - start
+
+	def setCompareFunction( self, fxn ):
+		self.compare = self.engine.set_compare_fxn( self._instrument( 'compare', fxn ) )
 
 	def setSuccessorsFunction( self, fxn ):
-		self.successors_of = successors_fxn(fxn)
-		lib.dijkstra_set_successors_fxn.restype = None
-		lib.dijkstra_set_successors_fxn.argtypes = [c_void_p, successors_fxn]
-		lib.dijkstra_set_successors_fxn( self.handle, self.successors_of )
+		self.successors_of = self.engine.set_successors_fxn( self._instrument( 'successors_of', fxn ) )
+		self._invalidate_cache( )
+
+	# Store the distance to goal of every state that can reach it, in
+	# the search's distance cache.
+	def fillDistanceCache( self, goal, predecessors_of = None ):
+		if self.cache is None:
+			raise ValueError( "the search has no distance cache" )
+		return self.engine.fill( goal, predecessors_of )
 
 	def cleanup( self ):
-		lib.dijkstra_cleanup.restype  = None
-		lib.dijkstra_cleanup.argtypes = [c_void_p]
-		lib.dijkstra_cleanup( self.handle )
+		self.solution = None
+		self.engine.cleanup( )
 
 	def find( self, start, end ):
-		lib.dijkstra_find.restype  = c_bool
-		lib.dijkstra_find.argtypes = [c_void_p, py_object, py_object]
-		return lib.dijkstra_find( self.handle, py_object(start), py_object(end) )
+		self.solution = None
+		if self.stats is not None:
+			self.stats.reset( )
+			return self._measure( self.engine.find, start, end )
+		return self.engine.find( start, end )
 
-	def __iter__( self ):
-		return self
+	# The states of the solution, from the end state back to the
+	# start state. The path is extracted from the engine in one pass
+	# after a search and kept until the next search or cleanup.
+	def _solution( self ):
+		if self.solution is None:
+			states   = self.engine.path( )
+			cost     = self.engine.path_cost( states )
+			self.solution = (tuple(states), cost)
+		return self.solution
 
-	def next( self ):
-		if self.node == None:
-			lib.dijkstra_first_node.restype  = c_void_p
-			lib.dijkstra_first_node.argtypes = [c_void_p]
-			self.node = lib.dijkstra_first_node( self.handle )
-		else:
-			lib.dijkstra_next_node.restype  = c_void_p
-			lib.dijkstra_next_node.argtypes = [c_void_p]
-			self.node = lib.dijkstra_next_node( self.node )
-
-		if self.node != None:
-			lib.dijkstra_state.restype  = py_object
-			lib.dijkstra_state.argtypes = [c_void_p]
-			state = lib.dijkstra_state( self.node )
-			return state
-		else:
-			raise StopIteration
+	def path( self ):
+		return list(self._solution( )[ 0 ])
+
+	# The number of states on the path, including both ends.
+	def pathLength( self ):
+		return len(self._solution( )[ 0 ])
+
+	# The sum of the step costs along the path, or None when the
+	# search has no cost function or found no path.
+	def pathCost( self ):
+		return self._solution( )[ 1 ]
+
+	# Every call returns a new iterator, so a solved search can be
+	# iterated more than once.
+	def __iter__( self ):
+		return iter(self._solution( )[ 0 ])
 
 	def iterativeInit( self, start, end, found ):
-		lib.dijkstra_iterative_init.restype  = None
-		lib.dijkstra_iterative_init.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.dijkstra_iterative_init( self.handle, py_object(start), py_object(end), py_object(found) )
+		self.solution = None
+		if self.stats is not None:
+			self.stats.reset( )
+			return self._measure( self.engine.iterative_init, start, end, found )
+		return self.engine.iterative_init( start, end, found )
 
 	def iterativeFind( self, start, end, found ):
-		lib.dijkstra_iterative_find.restype  = None
-		lib.dijkstra_iterative_find.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.dijkstra_iterative_find( self.handle, py_object(start), py_object(end), py_object(found) )
+		self.solution = None
+		if self.stats is not None:
+			return self._measure( self.engine.iterative_find, start, end, found )
+		return self.engine.iterative_find( start, end, found )
 
 	def iterativeIsDone( self, found ):
-		lib.dijkstra_iterative_is_done.restype  = c_bool
-		lib.dijkstra_iterative_is_done.argtypes = [c_void_p, py_object]
-		return lib.dijkstra_iterative_is_done( self.handle, py_object(found) )
+		return self.engine.iterative_is_done( found )
+
+	# Step a search started with iterativeInit until it is done, until
+	# nodes more steps have been taken or until timeit.default_timer()
+	# passes deadline, whichever comes first. Every step expands at
+	# most one node, except with external memory, where a step is a
+	# whole chunk of up to ExternalMemory.chunk states. Returns whether
+	# the search is done; if it is not, another call picks up where
+	# this one stopped.
+	def iterativeRun( self, start, end, found, nodes = None, deadline = None ):
+		timer = timeit.default_timer
+		steps = 0
+		while not self.iterativeIsDone( found ):
+			if nodes is not None and steps >= nodes:
+				return False
+			if deadline is not None and timer() >= deadline:
+				return False
+			self.iterativeFind( start, end, found )
+			steps += 1
+		return True
+
+	# The best path an unfinished search has so far, from the state
+	# closest to the end by the heuristic back to the start, or the
+	# solution once there is one. Searches without a heuristic and
+	# searches on libcsearch have no partial path to offer.
+	def partialPath( self ):
+		return self.engine.partial_path( )
+
+#  Best First Search Algorithm
+#
+#  Best-first search is a method of combinatorial search where
+#  a heuristic function is used to guide the search toward the
+#  goal. The heuristic function takes two nodes as input and
+#  evaluates how likely that node will lead toward the goal.
+#
+#  Giving beam_width, max_states or both turns it into a beam search
+#  whose open set is kept within those bounds by dropping the states
+#  with the worst heuristic values. beam_width bounds the open set
+#  only; max_states bounds open and expanded states together, and so
+#  memory. A beam search that finds nothing
+#  after dropping states is retried with both bounds multiplied by
+#  widen, up to retries times. Beam search runs on the Python engine.
+#
+#  A StateIndexer passed as indexer works as for DijkstraSearch, and
+#  a HeuristicCache passed as heuristic_cache as for AStarSearch.
+class BestFirstSearch( _Search ):
+	def __init__( self, compare, state_hasher, heuristic, successors_of, backend = None, beam_width = None, max_states = None, retries = 0, widen = 2, indexer = None, heuristic_cache = None ):
+		beam = beam_width is not None or max_states is not None
+		if beam and indexer is not None:
+			raise ValueError( "beam search and indexer cannot be combined" )
+		if indexer is not None:
+			self._create_indexed( compare, state_hasher, heuristic, None, successors_of, indexer, backend )
+		elif not beam:
+			self._create( 'bestfs', compare, state_hasher, heuristic, None, successors_of, backend )
+		else:
+			engine = _BeamSearch( compare, state_hasher, heuristic, successors_of, beam_width, max_states, retries, widen )
+			self._attach_python( "beam search", engine, backend, compare, state_hasher, heuristic, None, successors_of )
+		self._use_heuristic_cache( heuristic_cache )
+
+	def setHeuristicFunction( self, fxn ):
+		self._invalidate_heuristic_cache( )
+		self.heuristic = self.engine.set_heuristic_fxn( self._instrument( 'heuristic', fxn ) )
+
+	# The number of states a beam search dropped, over every retry of
+	# the last search.
+	def prunedCount( self ):
+		return getattr( self.engine, 'pruned', 0 )
+
+	# The beam width the last search ended with, after any widening.
+	def beamWidth( self ):
+		return getattr( self.engine, 'width', None )
+
+# The heuristic scaled by weight. libcsearch takes whole numbers, so
+# the result is rounded down.
+def _weighted( heuristic, weight ):
+	if weight == 1:
+		return heuristic
+	def weighted( state1, state2 ):
+		return int(weight * heuristic( state1, state2 ))
+	return weighted
+
+#  Dijkstra's Algorithm
+#
+#  Dijkstra 's algorithm computes the shortest path between a
+#  start node and a goal node in a graph.
+#
+#  With bidirectional=True the search also grows backward from the
+#  goal and stops when the two sides meet on a shortest path. The
+#  backward side uses predecessors_of, or successors_of when it is
+#  not given. This runs on the Python engine.
+#
+#  A DistanceCache passed as cache keeps the distances learned toward
+#  each goal and is shared by every search given the same cache. This
+#  runs on the Python engine too.
+#
+#  An ExternalMemory passed as external keeps the open and closed sets
+#  in files instead of memory, for state spaces too large for it, and
+#  a StateIndexer passed as indexer keeps them in flat arrays indexed
+#  by state number.
+class DijkstraSearch( _Search ):
+	def __init__( self, compare, state_hasher, cost, successors_of, backend = None, bidirectional = False, predecessors_of = None, cache = None, external = None, indexer = None ):
+		if (bidirectional, cache is not None, external is not None, indexer is not None).count( True ) > 1:
+			raise ValueError( "bidirectional, cache, external and indexer cannot be combined" )
+		if bidirectional:
+			self._create_bidirectional( compare, state_hasher, None, cost, successors_of, predecessors_of, backend )
+		elif cache is not None:
+			self._create_cached( compare, state_hasher, None, cost, successors_of, cache, backend )
+		elif external is not None:
+			self._create_external( compare, state_hasher, None, cost, successors_of, external, backend )
+		elif indexer is not None:
+			self._create_indexed( compare, state_hasher, None, cost, successors_of, indexer, backend )
+		else:
+			self._create( 'dijkstra', compare, state_hasher, None, cost, successors_of, backend )
+
+	def setCostFunction( self, fxn ):
+		self.cost = self.engine.set_cost_fxn( self._instrument( 'cost', fxn ) )
+		self._invalidate_cache( )
+
+	# One-to-many search: settle every state reachable from start, or
+	# stop once every state in goals is settled, and return their
+	# distances and shortest path tree as a DistanceMap. This runs on
+	# the Python engine, whatever the search was created with.
+	def findAll( self, start, goals = None ):
+		functions = self.functions
+		sweep = _PythonSearch( functions[ 'compare' ], functions[ 'state_hasher' ], None, functions[ 'cost' ], functions[ 'successors_of' ] )
+		if self.stats is None:
+			return sweep.sweep( start, goals )
+
+		self.stats.reset( )
+		for name in ('compare', 'state_hasher', 'cost'):
+			if functions[ name ] != None:
+				getattr( sweep, 'set_' + name + '_fxn' )( _timed( functions[ name ], self.stats, name ) )
+		sweep.set_successors_fxn( _timed_successors( functions[ 'successors_of' ], self.stats, sweep.sizes ) )
+		return self._measure( sweep.sweep, start, goals )
 
 #  A* Search Algorithm
 #
@@ -250,99 +2345,170 @@ class DijkstraSearch:
 #  algorithm and best-first search combined. It will produce the
 #  shortest path, like Dijkstra's, and avoids visiting unnecessary
 #  nodes, like BFS.
-class AStarSearch:
-	handle = None
-	node = None
-	compare = None
-	state_hasher = None
-	heuristic = None
-	cost = None
-	successors_of = None
+#
+#  A bidirectional mode, a distance cache, external memory and a
+#  state indexer are available as for DijkstraSearch. The cache needs an admissible
+#  heuristic and external memory a consistent one.
+#
+#  A HeuristicCache passed as heuristic_cache saves calls to an
+#  expensive heuristic for states reached more than once. It works on
+#  either engine and with every mode but the bidirectional one, whose
+#  two sides head for different goals.
+class AStarSearch( _Search ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of, backend = None, bidirectional = False, predecessors_of = None, cache = None, external = None, indexer = None, heuristic_cache = None ):
+		if (bidirectional, cache is not None, external is not None, indexer is not None).count( True ) > 1:
+			raise ValueError( "bidirectional, cache, external and indexer cannot be combined" )
+		if bidirectional and heuristic_cache is not None:
+			raise ValueError( "a heuristic cache cannot serve both sides of a bidirectional search" )
+		if bidirectional:
+			self._create_bidirectional( compare, state_hasher, heuristic, cost, successors_of, predecessors_of, backend )
+		elif cache is not None:
+			self._create_cached( compare, state_hasher, heuristic, cost, successors_of, cache, backend )
+		elif external is not None:
+			self._create_external( compare, state_hasher, heuristic, cost, successors_of, external, backend )
+		elif indexer is not None:
+			self._create_indexed( compare, state_hasher, heuristic, cost, successors_of, indexer, backend )
+		else:
+			self._create( 'astar', compare, state_hasher, heuristic, cost, successors_of, backend )
+		self._use_heuristic_cache( heuristic_cache )
 
-	def __init__( self, compare, state_hasher, heuristic, cost, successors_of ):
-		self.compare       = compare_fxn(compare)
-		self.state_hasher  = state_hash_fxn(state_hasher)
-		self.heuristic     = heuristic_fxn(heuristic)
-		self.cost          = cost_fxn(cost)
-		self.successors_of = successors_fxn(successors_of)
+	def setHeuristicFunction( self, fxn ):
+		self._invalidate_heuristic_cache( )
+		self.heuristic = self.engine.set_heuristic_fxn( self._instrument( 'heuristic', fxn ) )
 
-		lib.astar_create.restype  = c_void_p
-		lib.astar_create.argtypes = [compare_fxn, state_hash_fxn, heuristic_fxn, cost_fxn, successors_fxn]
-		self.handle = lib.astar_create( self.compare, self.state_hasher, self.heuristic, self.cost, self.successors_of )
+	def setCostFunction( self, fxn ):
+		self.cost = self.engine.set_cost_fxn( self._instrument( 'cost', fxn ) )
+		self._invalidate_cache( )
 
-	def __deinit__( self ):
-		lib.astar_destroy.restype  = None
-		lib.astar_destroy.argtypes = [c_void_p]
-		lib.astar_destroy( self.handle )
+	# Anytime weighted A*. The search is run with the heuristic scaled
+	# by each weight in turn until deadline, a timeit.default_timer()
+	# time, passes. A solution found with weight w costs at most w
+	# times the optimum, so early weights answer fast and later ones
+	# tighten the answer; a weight of 1 gives an optimal solution.
+	#
+	# The cheapest solution found is kept for path() and pathCost(),
+	# and the weight it was found with is returned, or None when no
+	# run finished in time. A later weight that matches its cost is
+	# returned instead, as it gives the tighter bound.
+	def findAnytime( self, start, end, deadline, weights = (3, 2, 1.5, 1) ):
+		if self.cache is not None:
+			raise ValueError( "a distance cache needs exact solutions" )
 
-	def setCompareFunction( self, fxn ):
-		self.compare = compare_fxn(fxn)
-		lib.astar_set_compare_fxn.restype = None
-		lib.astar_set_compare_fxn.argtypes = [c_void_p, compare_fxn]
-		lib.astar_set_compare_fxn( self.handle, self.compare )
+		heuristic = self.functions[ 'heuristic' ]
+		best      = None
+		weight    = None
+		found     = c_bool( False )
+		try:
+			for w in weights:
+				self.setHeuristicFunction( _weighted( heuristic, w ) )
+				self.iterativeInit( start, end, found )
+				if not self.iterativeRun( start, end, found, deadline = deadline ):
+					break
+				if found.value:
+					solution = self._solution( )
+					if best is None or solution[ 1 ] <= best[ 1 ]:
+						best   = solution
+						weight = w
+				self.engine.cleanup( )
+		finally:
+			self.setHeuristicFunction( heuristic )
+			self.engine.cleanup( )
+		self.solution = best
+		return weight
+
+#  Iterative Deepening A* (IDA*)
+#
+#  IDA* finds the same shortest paths as A* while keeping only the
+#  current path in memory, at the price of expanding states again on
+#  every iteration. It takes the same functions as AStarSearch and
+#  always runs in Python, as libcsearch has no IDA*.
+class IDAStarSearch( _Search ):
+	def __init__( self, compare, state_hasher, heuristic, cost, successors_of ):
+		engine = _IDAStarSearch( compare, state_hasher, heuristic, cost, successors_of )
+		self._attach( engine, compare, state_hasher, heuristic, cost, successors_of )
 
 	def setHeuristicFunction( self, fxn ):
-		self.state_hasher = state_hash_fxn(fxn)
-		lib.astar_set_heuristic_fxn.restype = None
-		lib.astar_set_heuristic_fxn.argtypes = [c_void_p, heuristic_fxn]
-		lib.astar_set_heuristic_fxn( self.handle, self.state_hasher )
+		self.heuristic = self.engine.set_heuristic_fxn( self._instrument( 'heuristic', fxn ) )
 
 	def setCostFunction( self, fxn ):
-		self.cost = cost_fxn(fxn)
-		lib.astar_set_cost_fxn.restype = None
-		lib.astar_set_cost_fxn.argtypes = [c_void_p, compare_fxn]
-		lib.astar_set_cost_fxn( self.handle, self.cost )
+		self.cost = self.engine.set_cost_fxn( self._instrument( 'cost', fxn ) )
 
-	def setSuccessorsFunction( self, fxn ):
-		self.successors_of = successors_fxn(fxn)
-		lib.astar_set_successors_fxn.restype = None
-		lib.astar_set_successors_fxn.argtypes = [c_void_p, successors_fxn]
-		lib.astar_set_successors_fxn( self.handle, self.successors_of )
+	# The number of nodes expanded by each iteration of the last
+	# search, one entry per threshold.
+	def iterationCounts( self ):
+		return list(self.engine.iterations)
 
-	def cleanup( self ):
-		lib.astar_cleanup.restype  = None
-		lib.astar_cleanup.argtypes = [c_void_p]
-		lib.astar_cleanup( self.handle )
 
-	def find( self, start, end ):
-		lib.astar_find.restype  = c_bool
-		lib.astar_find.argtypes = [c_void_p, py_object, py_object]
-		return lib.astar_find( self.handle, py_object(start), py_object(end) )
+#  Batch Solving
+#
+#  solve_many solves many independent start states against one goal
+#  on a pool of worker processes. Every worker builds its search once,
+#  by calling make_search, and reuses it for all of its tasks, so
+#  make_search must be a module-level function that the workers can
+#  import. Starts are handed out in chunks of chunksize.
+#
+#  Solutions are yielded as they are produced: in the order of the
+#  starts when ordered is True, or as each one completes otherwise.
+#  With a timeout, each search is stepped through the iterative
+#  methods and given up once it has run for timeout seconds, checked
+#  between steps.
+Solution = namedtuple( 'Solution', 'index path cost timed_out' )
 
-	def __iter__( self ):
-		return self
+_worker_make    = None
+_worker_search  = None
+_worker_goal    = None
+_worker_timeout = None
 
-	def next( self ):
-		if self.node == None:
-			lib.astar_first_node.restype  = c_void_p
-			lib.astar_first_node.argtypes = [c_void_p]
-			self.node = lib.astar_first_node( self.handle )
-		else:
-			lib.astar_next_node.restype  = c_void_p
-			lib.astar_next_node.argtypes = [c_void_p]
-			self.node = lib.astar_next_node( self.node )
-
-		if self.node != None:
-			lib.astar_state.restype  = py_object
-			lib.astar_state.argtypes = [c_void_p]
-			state = lib.astar_state( self.node )
-			return state
-		else:
-			raise StopIteration
+# The search is built by the first task rather than here: an exception
+# in a pool initializer only kills the worker, which the pool starts
+# again forever, while one in a task reaches the caller.
+def _solve_init( make_search, goal, timeout ):
+	global _worker_make, _worker_goal, _worker_timeout
+	_worker_make    = make_search
+	_worker_goal    = goal
+	_worker_timeout = timeout
 
-	def iterativeInit( self, start, end, found ):
-		lib.astar_iterative_init.restype  = None
-		lib.astar_iterative_init.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.astar_iterative_init( self.handle, py_object(start), py_object(end), py_object(found) )
+def _solve_task( task ):
+	global _worker_search
+	index, start = task
+	if _worker_search is None:
+		_worker_search = _worker_make( )
+	search = _worker_search
+	goal   = _worker_goal
 
-	def iterativeFind( self, start, end, found ):
-		lib.astar_iterative_find.restype  = None
-		lib.astar_iterative_find.argtypes = [c_void_p, py_object, py_object, py_object]
-		return lib.astar_iterative_find( self.handle, py_object(start), py_object(end), py_object(found) )
+	if _worker_timeout == None:
+		found = search.find( start, goal )
+	else:
+		deadline = timeit.default_timer() + _worker_timeout
+		found    = c_bool( False )
+		search.iterativeInit( start, goal, found )
+		while not search.iterativeIsDone( found ):
+			if timeit.default_timer() > deadline:
+				search.cleanup( )
+				return Solution( index, None, None, True )
+			search.iterativeFind( start, goal, found )
+		found = found.value
 
-	def iterativeIsDone( self, found ):
-		lib.astar_iterative_is_done.restype  = c_bool
-		lib.astar_iterative_is_done.argtypes = [c_void_p, py_object]
-		return lib.astar_iterative_is_done( self.handle, py_object(found) )
+	if found:
+		solution = Solution( index, search.path( ), search.pathCost( ), False )
+	else:
+		solution = Solution( index, None, None, False )
+	search.cleanup( )
+	return solution
 
+def solve_many( make_search, starts, goal, processes = None, chunksize = 1, ordered = True, timeout = None ):
+	from multiprocessing import Pool
 
+	pool = Pool( processes, _solve_init, (make_search, goal, timeout) )
+	try:
+		tasks = enumerate( starts )
+		if ordered:
+			results = pool.imap( _solve_task, tasks, chunksize )
+		else:
+			results = pool.imap_unordered( _solve_task, tasks, chunksize )
+		for solution in results:
+			yield solution
+		pool.close( )
+	finally:
+		pool.terminate( )
+		pool.join( )
@@ -0,0 +1,284 @@
+# Copyright (C) 2010 by Joseph A. Marrero
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#  Pattern Databases
+#
+#  Additive pattern databases for sliding tile puzzles. The tiles are
+#  split into disjoint groups, and for each group a table holds the
+#  fewest moves of that group's tiles needed to bring them from any
+#  placement to their goal positions, with the other tiles treated as
+#  interchangeable. Only moves of the group's own tiles are counted,
+#  so the values of all groups can be added and the sum is still an
+#  admissible heuristic.
+#
+#  A table is filled by a breadth-first search backward from the goal
+#  and is indexed by the rank of the positions of the group's tiles,
+#  read as a partial permutation. Tables are saved to one binary file
+#  and loaded with mmap, so processes that load the same file share
+#  its pages through the page cache. Usage:
+#
+#     python patterndb.py build <file> <width> <height> <group> [group ...]
+#
+#  where each group is a comma-separated list of tiles, for example
+#
+#     python patterndb.py build 8-puzzle.pdb 3 3 1,2,3,4 5,6,7,8
+#
+import mmap
+import struct
+import sys
+from collections import deque
+
+MAGIC      = b'CSPDB\x01'
+UNREACHED  = 255
+
+# Moves on a width x height board: the positions next to each
+# position.
+def neighbors( width, height ):
+	moves = []
+	for index in range(width * height):
+		x = index % width
+		y = index // width
+		adjacent = []
+		if x > 0:          adjacent.append( index - 1 )
+		if x < width - 1:  adjacent.append( index + 1 )
+		if y > 0:          adjacent.append( index - width )
+		if y < height - 1: adjacent.append( index + width )
+		moves.append( adjacent )
+	return moves
+
+# The number of ways to place k distinct tiles on n positions.
+def placements( n, k ):
+	count = 1
+	for i in range(k):
+		count *= n - i
+	return count
+
+# The rank of a placement of k tiles on n positions, between 0 and
+# placements(n, k) - 1. Each position is numbered among the positions
+# not taken by the tiles before it.
+def rank( positions, n ):
+	result = 0
+	used   = 0
+	for i, position in enumerate(positions):
+		smaller = bin(used & ((1 << position) - 1)).count( '1' )
+		result  = result * (n - i) + position - smaller
+		used   |= 1 << position
+	return result
+
+def unrank( value, n, k ):
+	digits = []
+	for i in range(k - 1, -1, -1):
+		digits.append( value % (n - i) )
+		value //= n - i
+	digits.reverse( )
+
+	free = list(range(n))
+	return [ free.pop( digit ) for digit in digits ]
+
+# The goal used when none is given: tiles in order with the blank
+# last.
+def default_goal( width, height ):
+	return tuple(range(1, width * height)) + (0,)
+
+# A csearch.StateIndexer that numbers width x height boards, as tuples
+# of tiles, by the rank of their permutation. There are (width *
+# height)! of them, so this suits the 8-puzzle but not the 15-puzzle.
+#
+# The rank is computed as in rank, with the set bits below each
+# position looked up in a table rather than counted.
+def permutation_indexer( width, height ):
+	from csearch import StateIndexer
+	n     = width * height
+	bits  = [ bin(mask).count( '1' ) for mask in range(1 << n) ]
+	below = [ (1 << position) - 1 for position in range(n) ]
+
+	def index( board ):
+		result = 0
+		used   = 0
+		radix  = n
+		for position in board:
+			result = result * radix + position - bits[ used & below[ position ] ]
+			used  |= 1 << position
+			radix -= 1
+		return result
+
+	return StateIndexer( placements( n, n ), index, lambda value: tuple(unrank( value, n, n )) )
+
+# Fill the table for one group of tiles. The abstract state is the
+# placement of the group's tiles plus the blank position, searched
+# with a 0-1 breadth-first search since only moves of the group's
+# tiles cost anything. The table keeps the smallest distance over
+# every blank position.
+def build_table( width, height, tiles, goal ):
+	n     = width * height
+	k     = len(tiles)
+	moves = neighbors( width, height )
+	count = placements( n, k )
+
+	distances = bytearray( [ UNREACHED ] ) * (count * n)
+	table     = bytearray( [ UNREACHED ] ) * count
+
+	start = [ goal.index( tile ) for tile in tiles ]
+	state = rank( start, n ) * n + goal.index( 0 )
+	distances[ state ] = 0
+	queue = deque( [ state ] )
+
+	while queue:
+		state    = queue.popleft( )
+		distance = distances[ state ]
+		placement, blank = divmod( state, n )
+		if distance < table[ placement ]:
+			table[ placement ] = distance
+
+		positions = unrank( placement, n, k )
+		for move in moves[ blank ]:
+			if move in positions:
+				moved = list(positions)
+				moved[ positions.index( move ) ] = blank
+				next_state = rank( moved, n ) * n + move
+				next_distance = distance + 1
+			else:
+				next_state = placement * n + move
+				next_distance = distance
+
+			if next_distance < distances[ next_state ]:
+				distances[ next_state ] = next_distance
+				if next_distance == distance:
+					queue.appendleft( next_state )
+				else:
+					queue.append( next_state )
+
+	return table
+
+# mmap indexing gives a one-character string on Python 2.
+def _read_bytes( buffer, index ):
+	return buffer[ index ]
+
+def _read_chars( buffer, index ):
+	return ord( buffer[ index ] )
+
+class PatternDatabase( object ):
+	def __init__( self, width, height, groups, goal, buffer, offsets ):
+		self.width   = width
+		self.height  = height
+		self.groups  = [ tuple(tiles) for tiles in groups ]
+		self.goal    = tuple(goal)
+		self.buffer  = buffer
+		self.offsets = offsets
+		self.read    = _read_chars if isinstance( buffer[ 0 ], str ) else _read_bytes
+
+	# The sum of every group's table entry for a state, given as a
+	# sequence of tiles in position order with 0 for the blank.
+	def distance( self, state ):
+		n     = self.width * self.height
+		where = [ 0 ] * n
+		for index in range(n):
+			where[ state[ index ] ] = index
+
+		total = 0
+		for tiles, offset in zip( self.groups, self.offsets ):
+			total += self.read( self.buffer, offset + rank( [ where[ tile ] for tile in tiles ], n ) )
+		return total
+
+	# A heuristic function for the search classes. The tables hold
+	# distances to the goal they were built for, so board2 must be
+	# that goal.
+	def heuristic( self, board1, board2 ):
+		return self.distance( board1 )
+
+	def save( self, filename ):
+		n = self.width * self.height
+		with open( filename, 'wb' ) as f:
+			f.write( MAGIC )
+			f.write( struct.pack( '<HHH', self.width, self.height, len(self.groups) ) )
+			for tiles in self.groups:
+				f.write( struct.pack( '<H', len(tiles) ) )
+				f.write( bytearray( tiles ) )
+			f.write( bytearray( self.goal ) )
+			start = self.offsets[ 0 ]
+			f.write( self.buffer[ start:start + sum( placements( n, len(tiles) ) for tiles in self.groups ) ] )
+
+	def close( self ):
+		if isinstance( self.buffer, mmap.mmap ):
+			self.buffer.close( )
+
+# Build additive pattern databases for the given groups of tiles.
+def build( width, height, groups, goal = None ):
+	if goal == None:
+		goal = default_goal( width, height )
+	seen = set()
+	for tiles in groups:
+		if 0 in tiles or seen.intersection( tiles ):
+			raise ValueError( "groups must be disjoint and must not contain the blank" )
+		seen.update( tiles )
+
+	buffer  = bytearray()
+	offsets = []
+	for tiles in groups:
+		offsets.append( len(buffer) )
+		buffer += build_table( width, height, tiles, goal )
+	return PatternDatabase( width, height, groups, goal, buffer, offsets )
+
+# Map a saved pattern database into memory.
+def load( filename ):
+	with open( filename, 'rb' ) as f:
+		buffer = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+
+	if buffer[ :len(MAGIC) ] != MAGIC:
+		buffer.close( )
+		raise ValueError( "{} is not a pattern database".format( filename ) )
+
+	offset = len(MAGIC)
+	width, height, count = struct.unpack_from( '<HHH', buffer, offset )
+	offset += 6
+	n = width * height
+
+	groups = []
+	for i in range(count):
+		k, = struct.unpack_from( '<H', buffer, offset )
+		offset += 2
+		groups.append( struct.unpack_from( '<{}B'.format( k ), buffer, offset ) )
+		offset += k
+
+	goal = struct.unpack_from( '<{}B'.format( n ), buffer, offset )
+	offset += n
+
+	offsets = []
+	for tiles in groups:
+		offsets.append( offset )
+		offset += placements( n, len(tiles) )
+	if offset > len(buffer):
+		buffer.close( )
+		raise ValueError( "{} is truncated".format( filename ) )
+
+	return PatternDatabase( width, height, groups, goal, buffer, offsets )
+
+def main():
+	if len(sys.argv) < 6 or sys.argv[ 1 ] != 'build':
+		print( "usage: python patterndb.py build <file> <width> <height> <group> [group ...]" )
+		sys.exit( 1 )
+
+	width  = int(sys.argv[ 3 ])
+	height = int(sys.argv[ 4 ])
+	groups = [ [ int(tile) for tile in group.split( ',' ) ] for group in sys.argv[ 5: ] ]
+	build( width, height, groups ).save( sys.argv[ 2 ] )
+
+if __name__ == '__main__':
+	main()
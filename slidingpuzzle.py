@@ -0,0 +1,205 @@
+# Copyright (C) 2010 by Joseph A. Marrero
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#  Sliding Puzzles
+#
+#  Width x height sliding tile puzzles, such as the 8-, 15- and
+#  24-puzzles, for the search classes. Boards are tuples of tiles in
+#  position order with 0 for the blank, so they can be searched as
+#  value states, without compare or hash functions.
+#
+#  Half of all boards cannot reach a given goal. solvable tells them
+#  apart in linear time before any search is started, and solve
+#  refuses them instead of letting a search exhaust the reachable half
+#  of the state space.
+#
+from csearch import AStarSearch
+import patterndb
+
+class SlidingPuzzle( object ):
+	def __init__( self, width, height, goal = None ):
+		self.name    = "{}-puzzle".format( width * height - 1 )
+		self.width   = width
+		self.height  = height
+		self.goal    = tuple(goal) if goal != None else patterndb.default_goal( width, height )
+		self.moves   = patterndb.neighbors( width, height )
+		self.rows    = [ list(range(y * width, (y + 1) * width)) for y in range(height) ]
+		self.columns = [ list(range(x, width * height, width)) for x in range(width) ]
+		self.target  = None
+		self.where   = None
+
+	# The position of every tile of board2, kept for the last board2
+	# seen since it is nearly always the goal.
+	def positions( self, board ):
+		if board is not self.target:
+			where = [ 0 ] * len(board)
+			for index, tile in enumerate(board):
+				where[ tile ] = index
+			self.target = board
+			self.where  = where
+		return self.where
+
+	def successors_of( self, board, handle ):
+		blank = board.index( 0 )
+		successors = []
+		for move in self.moves[ blank ]:
+			tiles = list(board)
+			tiles[ blank ], tiles[ move ] = tiles[ move ], 0
+			successors.append( tuple(tiles) )
+		return successors
+
+	def cost( self, board1, board2 ):
+		return 1
+
+	def manhattan( self, board1, board2 ):
+		where = self.positions( board2 )
+		width = self.width
+		sum = 0
+		for index, tile in enumerate(board1):
+			if tile != 0:
+				goal = where[ tile ]
+				sum += abs( index % width - goal % width ) + abs( index // width - goal // width )
+		return sum
+
+	# Manhattan distance plus two moves for every tile that has to
+	# leave its goal row or column to let another one past.
+	def linear_conflict( self, board1, board2 ):
+		where = self.positions( board2 )
+		width = self.width
+		sum   = self.manhattan( board1, board2 )
+		for y, row in enumerate(self.rows):
+			sum += line_conflicts( [ where[ board1[ i ] ] for i in row if board1[ i ] != 0 and where[ board1[ i ] ] // width == y ] )
+		for x, column in enumerate(self.columns):
+			sum += line_conflicts( [ where[ board1[ i ] ] for i in column if board1[ i ] != 0 and where[ board1[ i ] ] % width == x ] )
+		return sum
+
+	# Every move swaps the blank with a tile, flipping the parity of
+	# the permutation from the board to the goal along with the parity
+	# of the blank's distance from its goal position. A board can reach
+	# the goal exactly when the two parities agree. The permutation's
+	# parity is found from its cycles in one pass.
+	def solvable( self, board ):
+		where = self.positions( self.goal )
+		n     = len(board)
+		seen  = bytearray( n )
+		cycles = 0
+		for index in range(n):
+			if not seen[ index ]:
+				cycles += 1
+				while not seen[ index ]:
+					seen[ index ] = 1
+					index = where[ board[ index ] ]
+
+		blank = board.index( 0 )
+		goal  = where[ 0 ]
+		distance = abs( blank % self.width - goal % self.width ) + abs( blank // self.width - goal // self.width )
+		return (n - cycles) % 2 == distance % 2
+
+	# A board drawn uniformly at random, from the solvable ones when
+	# solvable is True. Swapping the first two tiles pairs every
+	# unsolvable board with one solvable board, so the draw stays
+	# uniform.
+	def random_board( self, rng, solvable = True ):
+		tiles = list(self.goal)
+		rng.shuffle( tiles )
+		board = tuple(tiles)
+		if solvable and not self.solvable( board ):
+			first, second = [ index for index, tile in enumerate(tiles) if tile != 0 ][ :2 ]
+			tiles[ first ], tiles[ second ] = tiles[ second ], tiles[ first ]
+			board = tuple(tiles)
+		return board
+
+	# The board at the end of a random walk of exactly depth moves from
+	# start, the goal by default, that never returns to a board it has
+	# already been on. The blank is tracked as the walk goes, and the
+	# walk backs up out of dead ends. The shortest solution of the
+	# board may still be shorter than depth.
+	def walk( self, rng, depth, start = None ):
+		tiles = list(start if start != None else self.goal)
+		blank = tiles.index( 0 )
+		seen  = set( [ tuple(tiles) ] )
+		trail = []
+		choices = [ rng.sample( self.moves[ blank ], len(self.moves[ blank ]) ) ]
+
+		while len(trail) < depth:
+			if not choices[ -1 ]:
+				choices.pop( )
+				if not trail:
+					return None
+				previous = trail.pop( )
+				seen.discard( tuple(tiles) )
+				tiles[ blank ], tiles[ previous ] = tiles[ previous ], 0
+				blank = previous
+				continue
+
+			move = choices[ -1 ].pop( )
+			tiles[ blank ], tiles[ move ] = tiles[ move ], 0
+			board = tuple(tiles)
+			if board in seen:
+				tiles[ move ], tiles[ blank ] = tiles[ blank ], 0
+				continue
+
+			seen.add( board )
+			trail.append( blank )
+			blank = move
+			choices.append( rng.sample( self.moves[ blank ], len(self.moves[ blank ]) ) )
+
+		return tuple(tiles)
+
+	# An A* search over boards as value states, guided by the linear
+	# conflict heuristic.
+	def search( self, backend = None ):
+		return AStarSearch( None, None, self.linear_conflict, self.cost, self.successors_of, backend = backend )
+
+	# The shortest solution of board, from the goal back to the board,
+	# or a ValueError when the board cannot reach the goal.
+	def solve( self, board, search = None ):
+		board = tuple(board)
+		if not self.solvable( board ):
+			raise ValueError( "the board cannot reach the goal" )
+		if search is None:
+			search = self.search( )
+		search.find( board, self.goal )
+		path = search.path( )
+		search.cleanup( )
+		return path
+
+# Given the goal positions, in board order, of the tiles that belong
+# on one row or column, count the moves needed to get tiles past each
+# other. Tiles in conflict are taken out of the line one at a time,
+# the most conflicted first, and each one taken out costs two moves.
+def line_conflicts( goals ):
+	count = len(goals)
+	conflicts = [ 0 ] * count
+	for i in range(count):
+		for j in range(i + 1, count):
+			if goals[ i ] > goals[ j ]:
+				conflicts[ i ] += 1
+				conflicts[ j ] += 1
+
+	moves = 0
+	while count > 0 and max(conflicts) > 0:
+		k = conflicts.index( max(conflicts) )
+		conflicts[ k ] = 0
+		for j in range(count):
+			if conflicts[ j ] > 0 and goals[ min(j, k) ] > goals[ max(j, k) ]:
+				conflicts[ j ] -= 1
+		moves += 2
+	return moves